@@ -416,6 +416,12 @@ from sqlalchemy import text, func
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 from auth import validate_password  # ✅ BUG #13 FIX: Import password validator
+from src.pg_vectorstore import on_department_data_changed
+from src.document_catalog import (
+    get_document, delete_document as delete_catalog_document, list_documents, list_departments,
+    get_chunk_window, count_matching_chunks
+)
+from config import Config
 
 # Admin required decorator
 def admin_required(f):
@@ -426,6 +432,42 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def document_listing(source_type):
+    """Template arguments for one filtered page of the document catalog"""
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'department': request.args.get('department', ''),
+        'access_level': request.args.get('access_level', ''),
+        'file_type': request.args.get('file_type', '')
+    }
+    per_page = Config.ADMIN_DOCUMENTS_PAGE_SIZE
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    rows, total = list_documents(
+        source_type,
+        department=filters['department'] or None,
+        access_level=filters['access_level'] or None,
+        file_type=filters['file_type'] or None,
+        search=filters['q'] or None,
+        page=page,
+        per_page=per_page
+    )
+    pages = max((total + per_page - 1) // per_page, 1)
+    
+    return {
+        'documents': rows,
+        'departments': list_departments(source_type),
+        'filters': filters,
+        'pagination': {
+            'page': page,
+            'pages': pages,
+            'per_page': per_page,
+            'total': total,
+            'has_prev': page > 1,
+            'has_next': page < pages
+        }
+    }
+
 def register_admin_routes(app):
     
     @app.route("/admin")
@@ -436,7 +478,7 @@ def register_admin_routes(app):
         
         # Get stats
         total_docs_result = db.session.execute(text(
-            "SELECT COUNT(DISTINCT file_name) FROM document_embeddings"
+            "SELECT COUNT(*) FROM documents"
         )).scalar()
         
         total_users = User.query.count()
@@ -459,7 +501,7 @@ def register_admin_routes(app):
         # New docs this month
         first_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0)
         new_docs = db.session.execute(text(
-            "SELECT COUNT(DISTINCT file_name) FROM document_embeddings WHERE created_at >= :date"
+            "SELECT COUNT(*) FROM documents WHERE created_at >= :date"
         ), {"date": first_of_month}).scalar()
         
         stats = {
@@ -476,9 +518,9 @@ def register_admin_routes(app):
         dept_stats = db.session.execute(text("""
             SELECT 
                 department,
-                COUNT(DISTINCT file_name) as doc_count,
-                COUNT(*) as total_chunks
-            FROM document_embeddings 
+                COUNT(*) as doc_count,
+                SUM(chunk_count) as total_chunks
+            FROM documents
             GROUP BY department
         """)).fetchall()
         
@@ -532,46 +574,8 @@ def register_admin_routes(app):
     def admin_documents():
         """Document management page"""
         
-        # Get all documents with details
-        docs_result = db.session.execute(text("""
-            SELECT 
-                file_name,
-                department,
-                access_level,
-                file_type,
-                is_cross_dept,
-                uploaded_by,
-                MIN(created_at) as created_at,
-                COUNT(*) as chunk_count,
-                MIN(id) as id
-            FROM document_embeddings
-            WHERE file_name IS NOT NULL AND source_type = 'primary'  -- ✅ PRIMARY KB ONLY
-            GROUP BY file_name, department, access_level, file_type, is_cross_dept, uploaded_by
-            ORDER BY created_at DESC
-        """)).fetchall()
-        
-        documents = []
-        for doc in docs_result:
-            uploader = User.query.get(doc.uploaded_by) if doc.uploaded_by else None
-            documents.append({
-                'id': doc.id,
-                'file_name': doc.file_name,
-                'department': doc.department,
-                'access_level': doc.access_level,
-                'file_type': doc.file_type,
-                'is_cross_dept': doc.is_cross_dept,
-                'chunk_count': doc.chunk_count,
-                'created_at': doc.created_at,
-                'uploaded_by_name': uploader.name or uploader.email if uploader else 'Unknown'
-            })
-        
-        departments = db.session.execute(text(
-            "SELECT DISTINCT department FROM document_embeddings ORDER BY department"
-        )).fetchall()
-        
-        return render_template('admin_documents.html',
-                             documents=documents,
-                             departments=[d[0] for d in departments])
+        # One filtered page of the document catalog
+        return render_template('admin_documents.html', **document_listing('primary'))
     
     
     @app.route("/admin/knowledge-base")
@@ -580,46 +584,8 @@ def register_admin_routes(app):
     def admin_knowledge_base():
         """Secondary Knowledge Base (from approved feedback)"""
         
-        # Get all SECONDARY documents with details
-        docs_result = db.session.execute(text("""
-            SELECT 
-                file_name,
-                department,
-                access_level,
-                file_type,
-                is_cross_dept,
-                uploaded_by,
-                MIN(created_at) as created_at,
-                COUNT(*) as chunk_count,
-                MIN(id) as id
-            FROM document_embeddings
-            WHERE file_name IS NOT NULL AND source_type = 'secondary'  -- ✅ SECONDARY KB ONLY
-            GROUP BY file_name, department, access_level, file_type, is_cross_dept, uploaded_by
-            ORDER BY created_at DESC
-        """)).fetchall()
-        
-        documents = []
-        for doc in docs_result:
-            uploader = User.query.get(doc.uploaded_by) if doc.uploaded_by else None
-            documents.append({
-                'id': doc.id,
-                'file_name': doc.file_name,
-                'department': doc.department,
-                'access_level': doc.access_level,
-                'file_type': doc.file_type,
-                'is_cross_dept': doc.is_cross_dept,
-                'chunk_count': doc.chunk_count,
-                'created_at': doc.created_at,
-                'uploaded_by_name': uploader.name or uploader.email if uploader else 'Unknown'
-            })
-        
-        departments = db.session.execute(text(
-            "SELECT DISTINCT department FROM document_embeddings WHERE source_type = 'secondary' ORDER BY department"
-        )).fetchall()
-        
-        return render_template('admin_knowledge_base.html',
-                             documents=documents,
-                             departments=[d[0] for d in departments])
+        # One filtered page of the SECONDARY document catalog
+        return render_template('admin_knowledge_base.html', **document_listing('secondary'))
 
     
     @app.route("/admin/documents/<int:doc_id>/view")
@@ -629,43 +595,12 @@ def register_admin_routes(app):
         """View document chunks and details"""
         
         # Get the document details
-        doc = db.session.execute(text("""
-            SELECT 
-                file_name,
-                department,
-                access_level,
-                file_type,
-                is_cross_dept,
-                uploaded_by,
-                created_at,
-                file_hash
-            FROM document_embeddings
-            WHERE id = :id
-            LIMIT 1
-        """), {"id": doc_id}).fetchone()
+        doc = get_document(doc_id)
         
         if not doc:
             return "Document not found", 404
         
-        # Get all chunks for this document
-        chunks = db.session.execute(text("""
-            SELECT 
-                id,
-                content,
-                metadata,
-                created_at
-            FROM document_embeddings
-            WHERE file_name = :fname 
-              AND department = :dept
-            ORDER BY id
-        """), {
-            "fname": doc.file_name,
-            "dept": doc.department
-        }).fetchall()
-        
-        # Get uploader info
-        uploader = User.query.get(doc.uploaded_by) if doc.uploaded_by else None
-        
+        # Chunks are fetched a window at a time by the page (see document_chunks)
         document_info = {
             'id': doc_id,
             'file_name': doc.file_name,
@@ -675,30 +610,52 @@ def register_admin_routes(app):
             'is_cross_dept': doc.is_cross_dept,
             'created_at': doc.created_at,
             'file_hash': doc.file_hash[:16] + '...' if doc.file_hash else 'N/A',
-            'uploaded_by_name': uploader.name or uploader.email if uploader else 'Unknown',
-            'chunk_count': len(chunks)
+            'page_count': doc.page_count,
+            'uploaded_by_name': doc.uploaded_by_name,
+            'chunk_count': doc.chunk_count
         }
         
-        # Prepare chunks data
-        chunks_data = []
-        for i, chunk in enumerate(chunks, 1):
-            try:
-                import json
-                metadata = json.loads(chunk.metadata) if chunk.metadata else {}
-            except:
-                metadata = {}
-            
-            chunks_data.append({
-                'number': i,
-                'id': chunk.id,
-                'content': chunk.content,
-                'metadata': metadata,
-                'created_at': chunk.created_at
-            })
-        
         return render_template('view_document.html',
                              document=document_info,
-                             chunks=chunks_data)
+                             page_size=Config.ADMIN_CHUNKS_PAGE_SIZE)
+    
+    @app.route("/admin/documents/<int:doc_id>/chunks")
+    @login_required
+    @admin_required
+    def document_chunks(doc_id):
+        """
+        One window of a document's chunks (keyset pagination on id)
+        
+        Query args: after / before (chunk id cursor), limit, q (full-text search within the document)
+        """
+        doc = get_document(doc_id)
+        if not doc:
+            return jsonify({"status": "error", "message": "Document not found"}), 404
+        
+        after = request.args.get('after', type=int)
+        before = request.args.get('before', type=int)
+        limit = min(max(request.args.get('limit', Config.ADMIN_CHUNKS_PAGE_SIZE, type=int), 1), 100)
+        search = request.args.get('q', '').strip() or None
+        
+        rows, has_more = get_chunk_window(
+            doc_id, doc.source_type, after=after, before=before, limit=limit, search=search
+        )
+        
+        response = {
+            "status": "success",
+            "chunks": [{
+                'id': row.id,
+                'content': row.content,
+                'created_at': row.created_at.isoformat() if row.created_at else None
+            } for row in rows],
+            "has_next": has_more if before is None else True,
+            "has_prev": has_more if before is not None else after is not None
+        }
+        # Totals only on the first window of a listing; later windows reuse them
+        if after is None and before is None:
+            response["total"] = count_matching_chunks(doc_id, doc.source_type, search) if search else doc.chunk_count
+        
+        return jsonify(response)
 
     @app.route("/admin/documents/<int:doc_id>/delete", methods=['POST'])
     @login_required
@@ -707,19 +664,19 @@ def register_admin_routes(app):
         """Delete a document and all its chunks"""
         try:
             # Get document info
-            doc_info = db.session.execute(text(
-                "SELECT file_name, department FROM document_embeddings WHERE id = :id"
-            ), {"id": doc_id}).fetchone()
+            doc_info = get_document(doc_id)
             
             if not doc_info:
                 return jsonify({"status": "error", "message": "Document not found"}), 404
             
-            # Delete all chunks of this document
-            db.session.execute(text(
-                "DELETE FROM document_embeddings WHERE file_name = :fname AND department = :dept"
-            ), {"fname": doc_info.file_name, "dept": doc_info.department})
+            # Deleting the catalog row cascades to all chunks of this document
+            delete_catalog_document(doc_id)
             
             db.session.commit()
+            on_department_data_changed(
+                doc_info.department,
+                affects_all_departments=bool(doc_info.is_cross_dept) or doc_info.source_type == 'secondary'
+            )
             
             # Log activity
             log = AdminActivityLog(
@@ -1029,4 +986,98 @@ def register_admin_routes(app):
         else:
             return jsonify({"error": "Invalid data type"}), 400
         
-        return jsonify(data)
\ No newline at end of file
+        return jsonify(data)
+    
+    # ============================================
+    # CACHE STATISTICS
+    # ============================================
+    
+    @app.route("/admin/cache/stats")
+    @login_required
+    @admin_required
+    def cache_stats():
+        """Hit/miss counters for the application caches (this worker process)"""
+        from src.embedding_cache import EmbeddingCache
+        from src.query_cache import query_embedding_cache, answer_cache
+        from src.chatbot_registry import chatbot_registry
+        from src.conversation_store import conversation_store
+        from src.corpus_metadata import corpus_metadata
+        from src.query_rewriter import rewrite_stats
+        
+        return jsonify({
+            "embedding_cache": EmbeddingCache.stats(),
+            "query_embedding_cache": query_embedding_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "chatbot_registry": chatbot_registry.stats(),
+            "conversation_store": conversation_store.stats(),
+            "corpus_metadata": corpus_metadata.stats(),
+            "query_rewriter": rewrite_stats.stats()
+        })
+    
+    # ============================================
+    # VECTOR INDEX MANAGEMENT
+    # ============================================
+    
+    @app.route("/admin/vector-index")
+    @login_required
+    @admin_required
+    def vector_index_status():
+        """Current ANN index type, size and validity"""
+        from src.vector_index import get_ann_index_info
+        
+        return jsonify(get_ann_index_info())
+    
+    @app.route("/admin/vector-index/rebuild", methods=['POST'])
+    @login_required
+    @admin_required
+    def rebuild_vector_index():
+        """Rebuild the ANN index (e.g. after bulk uploads), optionally switching type"""
+        from src.vector_index import rebuild_ann_index
+        
+        try:
+            index_type = (request.get_json(silent=True) or {}).get('index_type')
+            result = rebuild_ann_index(index_type)
+            
+            log = AdminActivityLog(
+                admin_id=current_user.id,
+                action_type='rebuild_index',
+                target_type='vector_index',
+                description=f"Rebuilt {result['index_type'].upper()} vector index in {result['seconds']}s",
+                meta_data=result['index']
+            )
+            db.session.add(log)
+            db.session.commit()
+            
+            return jsonify({"status": "success", **result})
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Vector index rebuild failed: {str(e)}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+    
+    # ============================================
+    # INGESTION JOBS
+    # ============================================
+    
+    @app.route("/admin/upload/jobs")
+    @login_required
+    @admin_required
+    def ingestion_jobs():
+        """Most recent background upload jobs"""
+        from models import IngestionJob
+        
+        jobs = IngestionJob.query.order_by(IngestionJob.id.desc()).limit(20).all()
+        return jsonify([job.to_dict() for job in jobs])
+    
+    @app.route("/admin/upload/jobs/<int:job_id>")
+    @login_required
+    @admin_required
+    def ingestion_job_status(job_id):
+        """Stage, per-file progress, chunk counts and throughput of one upload job"""
+        from models import IngestionJob
+        
+        job = db.session.get(IngestionJob, job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job.to_dict())
@@ -1,21 +1,26 @@
 import os
+import json
 import hashlib  # ✅ BUG #11 FIX: Added for file hashing
 import mimetypes  # ✅ BUG #15 FIX: For MIME type validation
+import tempfile
 from werkzeug.utils import secure_filename  # ✅ BUG #15 FIX: For filename sanitization
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 from flask_login import login_required, current_user
 from config import Config
 from extensions import db, login_manager, migrate, limiter, csrf  # ✅ BUG #12 & #14 FIX
-from models import User, ChatHistory, ChatSession, AdminActivityLog, UnansweredQuery
+from models import User, ChatHistory, ChatSession, AdminActivityLog, UnansweredQuery, IngestionJob
 from auth import register_auth_routes
 from admin_routes import register_admin_routes  # NEW: Import admin routes
 from feedback_routes import register_feedback_routes  # PHASE 3A: Import feedback routes
-from src.data_loader import load_documents
-from src.embeddings import EmbeddingPipeline
+from src.ingestion_jobs import create_job, run_job_inline, ensure_ingestion_workers, heartbeat_interval, NoDocumentsError
 from src.pg_vectorstore import PostgresVectorStore
 from src.rag_chain import RAGChatbot
+from src.chatbot_registry import chatbot_registry
+from src.conversation_store import conversation_store
+from src.corpus_metadata import corpus_metadata
+from src.document_catalog import find_by_hashes
+from src.llm_clients import ensure_warm_up
 from datetime import datetime
-from sqlalchemy import text
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -39,13 +44,13 @@ def allowed_extension(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def validate_file(f):
+UPLOAD_READ_SIZE = 64 * 1024  # Bytes per read when streaming an upload to disk
+
+def validate_filename(filename):
     """
-    ✅ BUG #15 FIX: Comprehensive file validation
+    ✅ BUG #15 FIX: Name-level validation (no file I/O)
     Returns: (is_valid: bool, error_message: str)
     """
-    filename = f.filename
-
     # 1. Check filename exists
     if not filename:
         return False, "No filename provided"
@@ -60,39 +65,76 @@ def validate_file(f):
         ext = filename.rsplit('.', 1)[-1].upper() if '.' in filename else 'UNKNOWN'
         return False, f"File type .{ext} not allowed. Allowed: PDF, DOCX, TXT, XLSX"
 
-    # 4. Check file size
-    f.seek(0, 2)  # Seek to end
-    file_size = f.tell()
-    f.seek(0)     # Reset pointer
-
-    if file_size == 0:
-        return False, f"File '{filename}' is empty"
-
-    if file_size > MAX_FILE_SIZE:
-        size_mb = file_size / (1024 * 1024)
-        return False, f"File '{filename}' is {size_mb:.1f}MB - exceeds 50MB limit"
-
-    # 5. Check MIME type
+    # 4. Check MIME type
     mime_type, _ = mimetypes.guess_type(filename)
     if mime_type and mime_type not in ALLOWED_MIME_TYPES:
         return False, f"File '{filename}' has invalid MIME type: {mime_type}"
 
-    # 6. Validate file content (magic bytes check)
-    header = f.read(8)
-    f.seek(0)
-
-    ext = filename.rsplit('.', 1)[1].lower()
-
-    # PDF magic bytes: %PDF
-    if ext == 'pdf' and not header.startswith(b'%PDF'):
-        return False, f"File '{filename}' is not a valid PDF (content mismatch)"
+    return True, ""
 
-    # DOCX/XLSX magic bytes: PK (ZIP format)
-    if ext in ('docx', 'xlsx') and not header.startswith(b'PK'):
-        return False, f"File '{filename}' is not a valid {ext.upper()} (content mismatch)"
+def stage_upload(f, upload_path, batch_bytes_left):
+    """
+    Stream one uploaded file to a temporary file in upload_path in a single pass,
+    hashing it (✅ BUG #11), enforcing size limits and checking magic bytes (✅ BUG #15)
+    as it goes. The caller renames the temp file into place or deletes it.
 
-    return True, ""
+    Returns:
+        dict: {'temp_path', 'size', 'file_hash'} or {'error': message, 'batch_limit': bool}
+    """
+    filename = f.filename
+    ext = filename.rsplit('.', 1)[1].lower()
+    sha256 = hashlib.sha256()
+    size = 0
+    header = b""
+    error = None
+    batch_limit = False
 
+    fd, temp_path = tempfile.mkstemp(dir=upload_path, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := f.stream.read(UPLOAD_READ_SIZE):
+                if len(header) < 8:
+                    header += chunk[:8 - len(header)]
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    error = f"File '{filename}' exceeds 50MB limit"
+                    break
+                if size > batch_bytes_left:
+                    error = "Total upload size exceeds 200MB batch limit"
+                    batch_limit = True
+                    break
+                sha256.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        # e.g. the client disconnected mid-upload: do not leave the partial file behind
+        discard_staged([{'temp_path': temp_path}])
+        raise
+
+    if error is None:
+        if size == 0:
+            error = f"File '{filename}' is empty"
+        # PDF magic bytes: %PDF
+        elif ext == 'pdf' and not header.startswith(b'%PDF'):
+            error = f"File '{filename}' is not a valid PDF (content mismatch)"
+        # DOCX/XLSX magic bytes: PK (ZIP format)
+        elif ext in ('docx', 'xlsx') and not header.startswith(b'PK'):
+            error = f"File '{filename}' is not a valid {ext.upper()} (content mismatch)"
+
+    if error is not None:
+        os.remove(temp_path)
+        return {'error': error, 'batch_limit': batch_limit}
+
+    return {'temp_path': temp_path, 'size': size, 'file_hash': sha256.hexdigest()}
+
+def discard_staged(staged):
+    """Delete temp files of staged uploads that were not moved into place"""
+    for item in staged:
+        if item.get('kept'):
+            continue
+        try:
+            os.remove(item['temp_path'])
+        except OSError:
+            pass
 
 db.init_app(app)
 login_manager.init_app(app)
@@ -111,24 +153,16 @@ register_auth_routes(app)
 register_admin_routes(app)  # NEW: Register admin routes
 register_feedback_routes(app)  # PHASE 3A: Register feedback routes
 
-# Store chatbot instances per session
-chatbot_instances = {}
+# Store chatbot instances per session (bounded LRU with idle timeout)
+chatbot_instances = chatbot_registry
 
-# ✅ BUG #11 FIX: File hash calculation function
-def calculate_file_hash(file):
-    """
-    Calculate SHA-256 hash of uploaded file for deduplication
-    Returns: hex string of file hash
-    """
-    sha256 = hashlib.sha256()
-    
-    # Read file in chunks to handle large files
-    file.seek(0)  # Reset file pointer to beginning
-    while chunk := file.read(8192):
-        sha256.update(chunk)
-    
-    file.seek(0)  # Reset for later use
-    return sha256.hexdigest()
+@app.before_request
+def start_background_workers():
+    """Background ingestion workers and the Azure warm-up start with the first request each process serves"""
+    ensure_ingestion_workers(app)
+    # Pre-open Azure OpenAI connections so the first chat does not pay the TLS handshake
+    if Config.AZURE_CLIENT_WARMUP:
+        ensure_warm_up()
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -151,6 +185,7 @@ def upload():
             "message": "Only administrators can upload documents. Please contact admin@starcement.co.in"
         }), 403
     
+    staged = []
     try:
         # Get department from form or use current user's department
         dept = request.form.get("department", current_user.department.strip().lower())
@@ -161,90 +196,86 @@ def upload():
         if not files or files[0].filename == '':
             return jsonify({"status": "error", "message": "No files selected"}), 400
 
-        # ✅ BUG #15 FIX: Check total batch size
-        total_size = 0
-        for f in files:
-            if f.filename:
-                f.seek(0, 2)
-                total_size += f.tell()
-                f.seek(0)
-
-        if total_size > MAX_TOTAL_SIZE:
-            total_mb = total_size / (1024 * 1024)
-            return jsonify({
-                "status": "error",
-                "message": f"Total upload size {total_mb:.1f}MB exceeds 200MB batch limit"
-            }), 400
-
-        # ✅ BUG #15 FIX: Validate each file before processing
+        # Get access control parameters from request
+        access_level = request.form.get("access_level", "public")
+        is_cross_dept = request.form.get("is_cross_dept", "false").lower() == "true"
+        
+        print(f"📁 Processing {len(files)} file(s) for department: {dept}")
+        print(f"🔒 Access level: {access_level}, Cross-dept: {is_cross_dept}")
+        
+        # ✅ BUG #15 FIX: Validate each file, streaming it to disk once while
+        # hashing, size-checking and sniffing magic bytes (no extra reads/seeks)
         validation_errors = []
+        batch_bytes_left = MAX_TOTAL_SIZE
+        
         for f in files:
-            if f.filename:
-                is_valid, error_msg = validate_file(f)
-                if not is_valid:
-                    validation_errors.append(error_msg)
-
+            if not f.filename:
+                continue
+            
+            is_valid, error_msg = validate_filename(f.filename)
+            if not is_valid:
+                validation_errors.append(error_msg)
+                continue
+            
+            result = stage_upload(f, upload_path, batch_bytes_left)
+            f.close()  # Release werkzeug's spooled copy as soon as it is on disk
+            if 'error' in result:
+                validation_errors.append(result['error'])
+                if result['batch_limit']:
+                    break
+                continue
+            
+            batch_bytes_left -= result['size']
+            result['filename'] = f.filename
+            # ✅ BUG #15 FIX: Use sanitized filename
+            result['safe_filename'] = secure_filename(f.filename)
+            staged.append(result)
+            print(f"🔍 {f.filename} → {result['safe_filename']} ({result['size']} bytes, hash {result['file_hash'][:16]}...)")
+        
         if validation_errors:
+            discard_staged(staged)
             print(f"❌ Validation failed: {validation_errors}")
             return jsonify({
                 "status": "error",
                 "message": "File validation failed",
                 "errors": validation_errors
             }), 400
-
-        # Get access control parameters from request
-        access_level = request.form.get("access_level", "public")
-        is_cross_dept = request.form.get("is_cross_dept", "false").lower() == "true"
         
-        print(f"📁 Processing {len(files)} file(s) for department: {dept}")
-        print(f"🔒 Access level: {access_level}, Cross-dept: {is_cross_dept}")
+        # ✅ BUG #11 FIX: Check the whole batch for duplicates in one indexed catalog lookup
+        existing_by_hash = find_by_hashes([item['file_hash'] for item in staged])
         
-        # ✅ BUG #11 FIX: Check for duplicate files before processing
         saved_files = []
         skipped_files = []
         file_hashes = {}
         
-        for f in files:
-            if not f.filename:
-                continue
-            
-            # ✅ BUG #15 FIX: Use sanitized filename
-            safe_filename = secure_filename(f.filename)
-            print(f"🔒 Sanitized filename: {f.filename} → {safe_filename}")
-            
-            # Calculate file hash
-            print(f"🔍 Calculating hash for: {f.filename}")
-            file_hash = calculate_file_hash(f)
-            print(f"   Hash: {file_hash[:16]}...")
-            
-            # Check if this file already exists in database
-            existing = db.session.execute(
-                text("""
-                    SELECT file_name, department, created_at
-                    FROM document_embeddings 
-                    WHERE file_hash = :hash 
-                    LIMIT 1
-                """),
-                {"hash": file_hash}
-            ).fetchone()
-            
+        for item in staged:
+            existing = existing_by_hash.get(item['file_hash'])
             if existing:
-                print(f"⚠️ DUPLICATE DETECTED: {f.filename}")
+                print(f"⚠️ DUPLICATE DETECTED: {item['filename']}")
                 print(f"   Already exists as: {existing.file_name} in {existing.department}")
                 print(f"   Uploaded on: {existing.created_at}")
                 skipped_files.append({
-                    'filename': f.filename,
+                    'filename': item['filename'],
                     'reason': f'Already exists as "{existing.file_name}" in {existing.department} department',
                     'uploaded_date': str(existing.created_at)
                 })
+                discard_staged([item])
+                continue
+            
+            if item['file_hash'] in file_hashes.values() or item['safe_filename'] in file_hashes:
+                skipped_files.append({
+                    'filename': item['filename'],
+                    'reason': 'Duplicate of another file in this upload'
+                })
+                discard_staged([item])
                 continue
             
-            # File is unique, save it
-            file_path = os.path.join(upload_path, safe_filename)
-            f.save(file_path)
-            saved_files.append(safe_filename)
-            file_hashes[safe_filename] = file_hash
-            print(f"✅ Saved: {safe_filename}")
+            # File is unique, move it into place
+            os.replace(item['temp_path'], os.path.join(upload_path, item['safe_filename']))
+            item['kept'] = True
+            saved_files.append(item['safe_filename'])
+            file_hashes[item['safe_filename']] = item['file_hash']
+            print(f"✅ Saved: {item['safe_filename']}")
         
         # If all files were duplicates
         if not saved_files:
@@ -255,97 +286,44 @@ def upload():
                 "skipped_files": skipped_files
             }), 409
         
-        # Load and process documents
-        print(f"📖 Loading {len(saved_files)} unique document(s) from: {upload_path}")
-        docs = load_documents(upload_path)
-        
-        if not docs:
-            return jsonify({"status": "error", "message": "No valid documents found"}), 400
-        
-        print(f"📄 Loaded {len(docs)} document pages")
+        # Parsing, embedding and storing run in a background ingestion job
+        job = create_job(current_user, dept, access_level, is_cross_dept,
+                         saved_files, file_hashes, skipped_files)
+        print(f"📥 Queued ingestion job #{job.id}: {len(saved_files)} file(s), {len(skipped_files)} skipped")
         
-        # Generate embeddings
-        print(f"🔢 Generating embeddings...")
-        embedding_pipeline = EmbeddingPipeline()
-        chunks, vectors = embedding_pipeline.process(docs)
-        
-        print(f"✂️ Created {len(chunks)} chunks")
-        
-        # ✅ BUG #11 FIX: Determine file hash for this batch
-        # If single file, use its hash; if multiple, use combined hash
-        if len(saved_files) == 1:
-            batch_file_hash = file_hashes[saved_files[0]]
-        else:
-            # For multiple files, create a combined hash
-            combined = ''.join(sorted(file_hashes.values()))
-            batch_file_hash = hashlib.sha256(combined.encode()).hexdigest()
-        
-        print(f"📦 Batch hash: {batch_file_hash[:16]}...")
-        
-        # Store in PostgreSQL vector store
-        store = PostgresVectorStore(dept, current_user)
-        inserted_count = store.build(
-            vectors, 
-            chunks,
-            access_level=access_level,
-            is_cross_dept=is_cross_dept,
-            source_type='primary',
-            uploaded_by=current_user.id,
-            file_name=", ".join(saved_files) if saved_files else None,
-            file_type=saved_files[0].split('.')[-1] if saved_files else None,
-            file_hash=batch_file_hash  # ✅ BUG #11 FIX: Pass file hash
-        )
-        
-        # ✅ BUG #10 FIX: Analyze table after bulk insert
-        try:
-            db.session.execute(text("ANALYZE document_embeddings"))
-            print("✅ Table statistics updated (ANALYZE)")
-        except Exception as e:
-            print(f"⚠️ ANALYZE failed (non-critical): {e}")
-        
-        # Log admin activity
-        log = AdminActivityLog(
-            admin_id=current_user.id,
-            action_type='upload',
-            target_type='document',
-            description=f"Uploaded {len(saved_files)} file(s) to {dept} department" + 
-                       (f" ({len(skipped_files)} duplicate(s) skipped)" if skipped_files else ""),
-            meta_data={
-                'files_uploaded': saved_files,
-                'files_skipped': len(skipped_files),
-                'skipped_details': skipped_files,
-                'chunks_created': len(chunks),
-                'vectors_stored': inserted_count,
-                'access_level': access_level,
-                'is_cross_dept': is_cross_dept,
-                'file_hash': batch_file_hash
-            }
-        )
-        db.session.add(log)
-        db.session.commit()
-        
-        # Clear chatbot instances for this department to force reload
-        keys_to_delete = [k for k in chatbot_instances.keys() if k.startswith(f"{current_user.id}_")]
-        for key in keys_to_delete:
-            del chatbot_instances[key]
-        
-        print(f"✅ Upload complete: {len(saved_files)} uploaded, {len(skipped_files)} skipped")
-        
-        # Prepare response
         response_data = {
-            "status": "success",
-            "message": f"Successfully processed {len(saved_files)} file(s), created {inserted_count} vectors",
-            "files_uploaded": saved_files,
-            "chunks_created": len(chunks),
-            "vectors_stored": inserted_count
+            "status": "queued",
+            "message": f"Processing {len(saved_files)} file(s) in the background",
+            "job_id": job.id,
+            "progress_url": f"/admin/upload/jobs/{job.id}",
+            "files_uploaded": saved_files
         }
         
+        ingestion_workers = ensure_ingestion_workers(app)
+        if ingestion_workers is not None:
+            ingestion_workers.notify()
+            status_code = 202
+        else:
+            # No worker threads configured: process inside the request as before
+            try:
+                run_job_inline(job.id, heartbeat_interval())
+            except NoDocumentsError as e:
+                return jsonify({"status": "error", "message": str(e), "job_id": job.id}), 400
+            job = db.session.get(IngestionJob, job.id)
+            response_data.update(
+                status="success",
+                message=f"Successfully processed {len(saved_files)} file(s), created {job.vectors_stored} vectors",
+                chunks_created=job.chunks_total,
+                vectors_stored=job.vectors_stored
+            )
+            status_code = 200
+        
         # Include skipped files info if any
         if skipped_files:
             response_data['skipped_files'] = skipped_files
             response_data['warning'] = f"{len(skipped_files)} duplicate file(s) were skipped"
         
-        return jsonify(response_data)
+        return jsonify(response_data), status_code
         
     except Exception as e:
         db.session.rollback()
@@ -356,6 +334,83 @@ def upload():
             "status": "error", 
             "message": f"Upload failed: {str(e)}"
         }), 500
+    finally:
+        # Any staged temp file not moved into place (errors, duplicates, early returns)
+        discard_staged(staged)
+
+NO_DOCUMENTS_REPLY = "⚠️ No documents found for your department. Please contact your administrator at admin@starcement.co.in to upload department documents first."
+
+def department_has_documents(dept):
+    """Check if department has Primary KB vectors (cached corpus metadata, no COUNT per message)"""
+    return corpus_metadata.has_documents(dept)
+
+def ensure_chat_session(chat_session_id, question):
+    """Return chat_session_id, creating a new session if none was provided"""
+    if chat_session_id:
+        return chat_session_id
+    
+    chat_session = ChatSession(
+        user_id=current_user.id,
+        title=question[:50] + "..." if len(question) > 50 else question
+    )
+    db.session.add(chat_session)
+    db.session.commit()
+    return chat_session.id
+
+def get_chatbot(dept, chat_session_id):
+    """Get or create chatbot instance for this session"""
+    bot_key = chatbot_instances.make_key(current_user.id, chat_session_id)
+    
+    chatbot = chatbot_instances.get(bot_key)
+    if chatbot is None:
+        # Use PostgreSQL vector store with user access control
+        store = PostgresVectorStore(dept, current_user)
+        chatbot = RAGChatbot(store, session_key=bot_key)
+        
+        # Seed the conversation store from the database only if no worker has loaded it yet
+        if conversation_store.get(bot_key) is None:
+            previous_chats = ChatHistory.query.filter_by(
+                session_id=chat_session_id
+            ).order_by(ChatHistory.timestamp.desc()).limit(Config.CONVERSATION_HISTORY_TURNS).all()
+            
+            conversation_store.set(bot_key, [
+                (prev_chat.question, prev_chat.answer)
+                for prev_chat in reversed(previous_chats)
+            ])
+        
+        chatbot_instances.put(bot_key, chatbot)
+    
+    return chatbot
+
+def save_chat_exchange(chat_session_id, dept, question, answer):
+    """Persist a question/answer pair (and unanswered-query log) for the session"""
+    # Check if this is an "unanswered" response
+    if "admin@starcement.co.in" in answer or "cannot find" in answer.lower():
+        # Log as unanswered query
+        unanswered = UnansweredQuery(
+            user_id=current_user.id,
+            question=question,
+            department=dept,
+            access_level=current_user.access_level
+        )
+        db.session.add(unanswered)
+    
+    # Save to database
+    chat_history = ChatHistory(
+        session_id=chat_session_id,
+        user_id=current_user.id,
+        question=question,
+        answer=answer
+    )
+    db.session.add(chat_history)
+    
+    # Update session timestamp
+    chat_session = db.session.get(ChatSession, chat_session_id)
+    if chat_session:
+        chat_session.updated_at = datetime.utcnow()
+    
+    db.session.commit()
+    return chat_history
 
 @app.route("/chat", methods=["POST"])
 @limiter.limit("30 per minute")  # ✅ BUG #12 FIX: Rate limit chat endpoint
@@ -371,79 +426,15 @@ def chat():
         
         dept = current_user.department.strip().lower()
         
-        # Check if department has vectors in PostgreSQL
-        result = db.session.execute(
-            text("""
-                SELECT COUNT(*) 
-                FROM document_embeddings 
-                WHERE (department = :dept OR is_cross_dept = true)
-                  AND source_type = 'primary'
-            """),
-            {"dept": dept}
-        ).scalar()
-        
-        if result == 0:
-            return jsonify({
-                "reply": "⚠️ No documents found for your department. Please contact your administrator at admin@starcement.co.in to upload department documents first."
-            }), 200
-        
-        # Create new session if none provided
-        if not chat_session_id:
-            chat_session = ChatSession(
-                user_id=current_user.id,
-                title=question[:50] + "..." if len(question) > 50 else question
-            )
-            db.session.add(chat_session)
-            db.session.commit()
-            chat_session_id = chat_session.id
+        if not department_has_documents(dept):
+            return jsonify({"reply": NO_DOCUMENTS_REPLY}), 200
         
-        # Get or create chatbot instance for this session
-        bot_key = f"{current_user.id}_{chat_session_id}"
+        chat_session_id = ensure_chat_session(chat_session_id, question)
         
-        if bot_key not in chatbot_instances:
-            # Use PostgreSQL vector store with user access control
-            store = PostgresVectorStore(dept, current_user)
-            chatbot_instances[bot_key] = RAGChatbot(store)
-            
-            # Load previous conversation history for this session
-            previous_chats = ChatHistory.query.filter_by(
-                session_id=chat_session_id
-            ).order_by(ChatHistory.timestamp).all()
-            
-            for prev_chat in previous_chats:
-                chatbot_instances[bot_key].conversation_history.append(
-                    (prev_chat.question, prev_chat.answer)
-                )
-        
-        bot = chatbot_instances[bot_key]
+        bot = get_chatbot(dept, chat_session_id)
         answer = bot.ask(question)
         
-        # Check if this is an "unanswered" response
-        if "admin@starcement.co.in" in answer or "cannot find" in answer.lower():
-            # Log as unanswered query
-            unanswered = UnansweredQuery(
-                user_id=current_user.id,
-                question=question,
-                department=dept,
-                access_level=current_user.access_level
-            )
-            db.session.add(unanswered)
-        
-        # Save to database
-        chat_history = ChatHistory(
-            session_id=chat_session_id,
-            user_id=current_user.id,
-            question=question,
-            answer=answer
-        )
-        db.session.add(chat_history)
-        
-        # Update session timestamp
-        chat_session = db.session.get(ChatSession, chat_session_id)
-        if chat_session:
-            chat_session.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        chat_history = save_chat_exchange(chat_session_id, dept, question, answer)
         
         return jsonify({
             "reply": answer,
@@ -460,6 +451,65 @@ def chat():
             "reply": f"⚠️ An error occurred while processing your request. Please try again or contact support."
         }), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/chat/stream", methods=["POST"])
+@limiter.limit("30 per minute")
+@login_required
+def chat_stream():
+    """
+    Streaming chat (Server-Sent Events)
+    
+    Events: 'session' (session_id), 'sources' (retrieved sources),
+    'token' (answer chunks as the LLM produces them), 'done' (full answer + chat_id)
+    or 'error'. ChatHistory is saved once the stream completes.
+    """
+    question = (request.json or {}).get("message")
+    chat_session_id = (request.json or {}).get("session_id")
+    
+    if not question:
+        return jsonify({"reply": "Please provide a message"}), 400
+    
+    dept = current_user.department.strip().lower()
+    
+    if not department_has_documents(dept):
+        return jsonify({"reply": NO_DOCUMENTS_REPLY}), 200
+    
+    def generate():
+        try:
+            # Inside the try: once the stream has started, failures must arrive as
+            # 'error' events, not a bare 500 that EventSource keeps retrying
+            session_id = ensure_chat_session(chat_session_id, question)
+            bot = get_chatbot(dept, session_id)
+            yield sse_event("session", {"session_id": session_id})
+            
+            for event in bot.ask_stream(question):
+                if event['type'] == 'done':
+                    chat_history = save_chat_exchange(session_id, dept, question, event['answer'])
+                    yield sse_event("done", {
+                        "reply": event['answer'],
+                        "session_id": session_id,
+                        "chat_id": chat_history.id
+                    })
+                else:
+                    yield sse_event(event['type'], event)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Chat stream error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield sse_event("error", {
+                "reply": "⚠️ An error occurred while processing your request. Please try again or contact support."
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route("/sessions", methods=["GET"])
 @login_required
 def get_sessions():
@@ -527,9 +577,9 @@ def delete_session(session_id):
         db.session.commit()
         
         # Clear from memory
-        bot_key = f"{current_user.id}_{session_id}"
-        if bot_key in chatbot_instances:
-            del chatbot_instances[bot_key]
+        bot_key = chatbot_instances.make_key(current_user.id, session_id)
+        chatbot_instances.discard(bot_key)
+        conversation_store.clear(bot_key)
         
         return jsonify({"status": "Session deleted successfully"})
     except Exception as e:
@@ -573,6 +623,7 @@ def ratelimit_handler(e):
 # ✅ BUG #14 FIX: Exempt JSON API endpoints from CSRF
 # (These use session-based auth, not HTML form submissions)
 csrf.exempt(chat)
+csrf.exempt(chat_stream)
 csrf.exempt(get_sessions)
 csrf.exempt(get_session)
 csrf.exempt(delete_session)
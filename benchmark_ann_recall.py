@@ -0,0 +1,86 @@
+"""
+ANN recall vs latency benchmark against exact search
+
+Usage:
+    python benchmark_ann_recall.py [department] [queries] [k]
+
+Samples stored embeddings as query vectors, computes the exact top-k with
+index scans disabled, then measures recall@k and median latency of the ANN
+index for a range of hnsw.ef_search / ivfflat.probes values.
+"""
+
+import sys
+import time
+from sqlalchemy import text
+from app import app
+from extensions import db
+from src.vector_index import get_ann_index_info
+
+SEARCH_SQL = """
+    SELECT id
+    FROM document_embeddings
+    WHERE source_type = 'primary'
+      AND (CAST(:dept AS text) IS NULL OR dept_partition IN (:dept, '_cross_dept'))
+    ORDER BY embedding <=> CAST(:vec AS vector)
+    LIMIT :k
+"""
+
+
+def run_query(vec, dept, k, settings):
+    """Run one search in its own transaction with the given SET LOCAL statements"""
+    for statement in settings:
+        db.session.execute(text(statement))
+    start = time.perf_counter()
+    ids = [r.id for r in db.session.execute(text(SEARCH_SQL), {"vec": vec, "dept": dept, "k": k})]
+    elapsed = (time.perf_counter() - start) * 1000
+    db.session.rollback()
+    return ids, elapsed
+
+
+def main():
+    dept = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != '-' else None
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    with app.app_context():
+        info = get_ann_index_info()
+        if not info['type']:
+            print("❌ No ANN index found - run the migrations or rebuild_vector_index.py first")
+            sys.exit(1)
+
+        print("=" * 60)
+        print(f"ANN RECALL BENCHMARK  index={info['type']} ({info['size']})  dept={dept or 'all'}  k={k}")
+        print("=" * 60)
+
+        samples = [r[0] for r in db.session.execute(text(
+            "SELECT embedding::text FROM document_embeddings ORDER BY random() LIMIT :n"
+        ), {"n": n_queries})]
+        db.session.rollback()
+
+        exact = []
+        exact_times = []
+        for vec in samples:
+            ids, ms = run_query(vec, dept, k, ["SET LOCAL enable_indexscan = off"])
+            exact.append(set(ids))
+            exact_times.append(ms)
+        exact_times.sort()
+        print(f"\nExact search: median {exact_times[len(exact_times) // 2]:.1f} ms")
+
+        if info['type'] == 'hnsw':
+            sweep = [("hnsw.ef_search", v) for v in (20, 40, 100, 200, 400)]
+        else:
+            sweep = [("ivfflat.probes", v) for v in (1, 5, 10, 20, 50)]
+
+        print(f"\n{'setting':<24}{'recall@' + str(k):>12}{'median ms':>12}")
+        for name, value in sweep:
+            recalls, times = [], []
+            for vec, truth in zip(samples, exact):
+                ids, ms = run_query(vec, dept, k, [f"SET LOCAL {name} = {value}"])
+                recalls.append(len(truth & set(ids)) / len(truth) if truth else 1.0)
+                times.append(ms)
+            times.sort()
+            print(f"{name + '=' + str(value):<24}{sum(recalls) / len(recalls):>12.3f}{times[len(times) // 2]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
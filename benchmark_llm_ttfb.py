@@ -0,0 +1,86 @@
+"""
+Azure OpenAI time-to-first-byte benchmark: per-call clients vs shared pool
+
+Usage:
+    python benchmark_llm_ttfb.py [runs]
+
+"Fresh" builds a new AzureChatOpenAI / AzureOpenAIEmbeddings for every call,
+the way each new chat session, upload and feedback approval used to.
+"Shared" uses the process-wide clients from src/llm_clients.py, whose
+keep-alive pool skips the TCP + TLS handshake after the first call.
+"""
+
+import sys
+import time
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from config import Config
+from src.llm_clients import get_chat_llm, get_embeddings, warm_up
+
+PROMPT = "Reply with the single word: ok"
+
+
+def fresh_llm():
+    return AzureChatOpenAI(
+        azure_deployment=Config.AZURE_OPENAI_CHAT_DEPLOYMENT,
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_API_KEY,
+        api_version=Config.AZURE_OPENAI_API_VERSION,
+        temperature=0.1,
+        max_tokens=5,
+        timeout=30
+    )
+
+
+def fresh_embedder():
+    return AzureOpenAIEmbeddings(
+        azure_deployment=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_API_KEY,
+        api_version=Config.AZURE_OPENAI_API_VERSION
+    )
+
+
+def chat_ttfb(get_llm):
+    """Milliseconds until the first streamed token arrives (client construction included)"""
+    start = time.perf_counter()
+    for _ in get_llm().stream(PROMPT):
+        break
+    return (time.perf_counter() - start) * 1000
+
+
+def embed_latency(get_embedder):
+    start = time.perf_counter()
+    get_embedder().embed_query("connection pool benchmark")
+    return (time.perf_counter() - start) * 1000
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print("=" * 60)
+    print(f"AZURE OPENAI TTFB BENCHMARK  runs={runs}")
+    print("=" * 60)
+
+    fresh_chat = [chat_ttfb(fresh_llm) for _ in range(runs)]
+    fresh_embed = [embed_latency(fresh_embedder) for _ in range(runs)]
+
+    warm_up()
+    shared_chat = [chat_ttfb(get_chat_llm) for _ in range(runs)]
+    shared_embed = [embed_latency(get_embeddings) for _ in range(runs)]
+
+    print(f"\n{'':<28}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, timings in (("Chat TTFB (fresh client)", fresh_chat),
+                           ("Chat TTFB (shared pool)", shared_chat),
+                           ("Embed query (fresh client)", fresh_embed),
+                           ("Embed query (shared pool)", shared_embed)):
+        p50, p95 = summarize(timings)
+        print(f"{label:<28}{p50:>10.1f}{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
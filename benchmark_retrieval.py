@@ -0,0 +1,69 @@
+"""
+Retrieval benchmark: sequential, parallel and single-query hybrid search
+
+Usage:
+    python benchmark_retrieval.py <department> "<question>" [runs]
+
+Embeds the question once, times each hybrid search path against the live
+database and prints EXPLAIN (ANALYZE, BUFFERS) for the single-query plan.
+"""
+
+import sys
+import time
+from sqlalchemy import text
+from app import app
+from extensions import db
+from src.pg_vectorstore import PostgresVectorStore
+from src.rag_chain import RAGChatbot
+
+
+def time_path(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    dept, question = sys.argv[1], sys.argv[2]
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    with app.app_context():
+        store = PostgresVectorStore(dept)
+        query_vector = RAGChatbot(store).embedder.embed_query(question)
+        access_levels = ['public', 'employee', 'manager', 'senior_mgmt', 'executive']
+        args = (query_vector, question, 5, 0.7, 0.7, access_levels)
+
+        print("=" * 60)
+        print(f"HYBRID RETRIEVAL BENCHMARK  dept={dept}  runs={runs}")
+        print("=" * 60)
+
+        seq_p50, seq_p95 = time_path(lambda: store._hybrid_search_sequential(*args), runs)
+        kb_p50, kb_p95 = time_path(lambda: store._hybrid_search_parallel(*args), runs)
+        spec_p50, spec_p95 = time_path(lambda: store._hybrid_search_parallel(*args, speculative=True), runs)
+        one_p50, one_p95 = time_path(lambda: store._hybrid_search_single_query(*args), runs)
+
+        print(f"\nSequential (up to 4 round trips): p50 {seq_p50:.1f} ms, p95 {seq_p95:.1f} ms")
+        print(f"Parallel per KB:                  p50 {kb_p50:.1f} ms, p95 {kb_p95:.1f} ms")
+        print(f"Parallel speculative:             p50 {spec_p50:.1f} ms, p95 {spec_p95:.1f} ms")
+        print(f"Single query (1 round trip):      p50 {one_p50:.1f} ms, p95 {one_p95:.1f} ms")
+
+        sql, params = store._build_hybrid_query(
+            query_vector, store._extract_keywords(question), 5, 0.7, 0.7, access_levels
+        )
+        plan = db.session.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params).fetchall()
+
+        print("\n--- SINGLE QUERY PLAN ---")
+        for row in plan:
+            print(row[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -12,4 +12,100 @@ class Config:
     AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
     AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
     AZURE_OPENAI_CHAT_DEPLOYMENT = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT")
-    AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
\ No newline at end of file
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+
+    # Vector store ingestion
+    VECTOR_INSERT_BATCH_SIZE = int(os.getenv("VECTOR_INSERT_BATCH_SIZE", "500"))  # Rows per multi-row INSERT
+
+    # Embedding throughput (match the Azure deployment's quota)
+    EMBEDDING_MAX_WORKERS = int(os.getenv("EMBEDDING_MAX_WORKERS", "4"))  # Concurrent embedding batches
+    EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "120000"))
+    EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "720"))
+
+    # Persistent embedding cache (embedding_cache table)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))  # LRU bound
+
+    # Query-embedding cache shared by all chatbots (optional Redis URL shares it across workers)
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+    QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))  # seconds
+    QUERY_EMBEDDING_CACHE_URL = os.getenv("QUERY_EMBEDDING_CACHE_URL")  # e.g. redis://localhost:6379/0
+
+    # Semantic answer cache in front of the LLM call
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+    ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "1800"))  # seconds
+    ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.05"))  # cosine distance
+
+    # Retrieval
+    HYBRID_SEARCH_SINGLE_QUERY = os.getenv("HYBRID_SEARCH_SINGLE_QUERY", "true").lower() == "true"  # One DB round trip per search
+
+    # ANN index on document_embeddings.embedding (see src/vector_index.py)
+    VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")  # 'hnsw' or 'ivfflat'
+    VECTOR_HNSW_M = int(os.getenv("VECTOR_HNSW_M", "16"))
+    VECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "64"))
+    VECTOR_HNSW_EF_SEARCH = int(os.getenv("VECTOR_HNSW_EF_SEARCH", "100"))  # pgvector default is 40
+    VECTOR_IVFFLAT_PROBES = int(os.getenv("VECTOR_IVFFLAT_PROBES", "10"))
+    VECTOR_INDEX_MAINTENANCE_WORK_MEM = os.getenv("VECTOR_INDEX_MAINTENANCE_WORK_MEM", "512MB")
+
+    # Search-time ANN settings are applied once per pooled connection (no extra round trip per query)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "connect_args": {
+            "options": f"-c hnsw.ef_search={VECTOR_HNSW_EF_SEARCH} -c ivfflat.probes={VECTOR_IVFFLAT_PROBES}"
+        }
+    }
+
+    # Per-session chatbot registry (LRU + idle timeout)
+    CHATBOT_REGISTRY_SIZE = int(os.getenv("CHATBOT_REGISTRY_SIZE", "500"))
+    CHATBOT_IDLE_TTL = int(os.getenv("CHATBOT_IDLE_TTL", "1800"))  # seconds
+
+    # Shared keep-alive HTTP pool for Azure OpenAI clients (see src/llm_clients.py)
+    AZURE_HTTP_MAX_CONNECTIONS = int(os.getenv("AZURE_HTTP_MAX_CONNECTIONS", "50"))
+    AZURE_HTTP_MAX_KEEPALIVE = int(os.getenv("AZURE_HTTP_MAX_KEEPALIVE", "20"))
+    AZURE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AZURE_HTTP_KEEPALIVE_EXPIRY", "120"))  # seconds
+    AZURE_HTTP_TIMEOUT = float(os.getenv("AZURE_HTTP_TIMEOUT", "60"))  # seconds
+    AZURE_CLIENT_WARMUP = os.getenv("AZURE_CLIENT_WARMUP", "true").lower() == "true"  # Pre-connect at startup
+
+    # Conversation history (last N turns per session); a Redis URL shares it across workers
+    CONVERSATION_HISTORY_TURNS = int(os.getenv("CONVERSATION_HISTORY_TURNS", "5"))
+    CONVERSATION_STORE_URL = os.getenv("CONVERSATION_STORE_URL")  # e.g. redis://localhost:6379/1
+    CONVERSATION_STORE_SIZE = int(os.getenv("CONVERSATION_STORE_SIZE", "5000"))  # in-memory sessions kept
+    CONVERSATION_STORE_TTL = int(os.getenv("CONVERSATION_STORE_TTL", "86400"))  # idle seconds
+
+    # Per-department corpus metadata used by /chat's "any documents?" check
+    CORPUS_METADATA_CACHE_SIZE = int(os.getenv("CORPUS_METADATA_CACHE_SIZE", "1024"))
+    CORPUS_METADATA_CACHE_TTL = int(os.getenv("CORPUS_METADATA_CACHE_TTL", "300"))  # seconds, bounds cross-worker staleness
+    CORPUS_METADATA_NEGATIVE_TTL = int(os.getenv("CORPUS_METADATA_NEGATIVE_TTL", "10"))  # seconds, for "no documents yet"
+
+    # Concurrent retrieval for the multi-query hybrid path (HYBRID_SEARCH_SINGLE_QUERY=false)
+    # 'off': sequential; 'per_kb': vector + keyword in parallel per KB (no extra DB load);
+    # 'speculative': Primary and Secondary at once, Secondary dropped if Primary is strong
+    # (lower tail latency for weak-Primary questions at the cost of extra queries)
+    RETRIEVAL_PARALLEL_MODE = os.getenv("RETRIEVAL_PARALLEL_MODE", "off").lower()
+    RETRIEVAL_PARALLEL_WORKERS = int(os.getenv("RETRIEVAL_PARALLEL_WORKERS", "8"))  # Keep within the DB pool size
+
+    # Overlap the LLM query rewrite with retrieval for the raw question in RAGChatbot
+    CHAT_PIPELINE_ENABLED = os.getenv("CHAT_PIPELINE_ENABLED", "true").lower() == "true"
+    CHAT_PIPELINE_WORKERS = int(os.getenv("CHAT_PIPELINE_WORKERS", "8"))
+
+    # Token budgets for the RAG prompt (see src/context_packer.py)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))  # Retrieved chunks
+    CONTEXT_HISTORY_TOKEN_BUDGET = int(os.getenv("CONTEXT_HISTORY_TOKEN_BUDGET", "300"))  # Previous exchange
+    CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "3"))
+    CONTEXT_TOKEN_ENCODING = os.getenv("CONTEXT_TOKEN_ENCODING", "o200k_base")  # gpt-4o family; cl100k_base for gpt-4/3.5
+
+    # Re-uploading a file with the same name and department diffs chunks instead of storing it again
+    INCREMENTAL_REINDEX_ENABLED = os.getenv("INCREMENTAL_REINDEX_ENABLED", "true").lower() == "true"
+
+    # Worker processes for parsing/splitting uploaded files (0 = parse in the web process)
+    INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+    # Background ingestion jobs (0 workers = process uploads inside the request)
+    INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))  # Threads per app process
+    INGEST_JOB_POLL_SECONDS = int(os.getenv("INGEST_JOB_POLL_SECONDS", "5"))
+    INGEST_JOB_STALE_SECONDS = int(os.getenv("INGEST_JOB_STALE_SECONDS", "120"))  # No heartbeat -> re-queue
+    INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+
+    # Rows per page on the admin Documents / Knowledge Base pages
+    ADMIN_DOCUMENTS_PAGE_SIZE = int(os.getenv("ADMIN_DOCUMENTS_PAGE_SIZE", "50"))
+    ADMIN_CHUNKS_PAGE_SIZE = int(os.getenv("ADMIN_CHUNKS_PAGE_SIZE", "10"))  # Chunks per window in the document viewer
@@ -0,0 +1,40 @@
+"""add embedding_cache table
+
+Revision ID: 5d1e8b3f9a42
+Revises: c33fa1aa2a72
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1e8b3f9a42'
+down_revision = 'c33fa1aa2a72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+
+    # Content-addressed cache: one row per (embedding deployment, normalized chunk text)
+    op.create_table(
+        'embedding_cache',
+        sa.Column('deployment', sa.String(length=100), nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.Column('embedding', Vector(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('deployment', 'text_hash')
+    )
+
+    # LRU eviction scans oldest entries first
+    op.create_index('idx_embedding_cache_last_used', 'embedding_cache', ['last_used_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_embedding_cache_last_used', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
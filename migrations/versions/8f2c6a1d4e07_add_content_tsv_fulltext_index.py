@@ -0,0 +1,39 @@
+"""add content_tsv full-text column and GIN index to document_embeddings
+
+Revision ID: 8f2c6a1d4e07
+Revises: 5d1e8b3f9a42
+Create Date: 2026-10-18 11:02:15.904311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2c6a1d4e07'
+down_revision = '5d1e8b3f9a42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generated STORED column: existing rows are backfilled by the table rewrite,
+    # new rows are kept in sync by PostgreSQL (no application changes on insert)
+    op.execute("""
+        ALTER TABLE document_embeddings
+        ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+    """)
+
+    # Serves the `content_tsv @@ to_tsquery(...)` keyword branch of hybrid search
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_document_embeddings_content_tsv
+        ON document_embeddings USING GIN (content_tsv)
+    """)
+
+    op.execute("ANALYZE document_embeddings")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_content_tsv")
+    op.execute("ALTER TABLE document_embeddings DROP COLUMN IF EXISTS content_tsv")
@@ -0,0 +1,92 @@
+"""add documents catalog table and document_embeddings.document_id
+
+Revision ID: a6c2e94f1b07
+Revises: f3a8d61b9c25
+Create Date: 2026-10-18 18:02:51.730114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c2e94f1b07'
+down_revision = 'f3a8d61b9c25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per stored file (or approved feedback entry in the Secondary KB)
+    op.create_table(
+        'documents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('department', sa.String(length=50), nullable=False),
+        sa.Column('file_name', sa.Text(), nullable=False),
+        sa.Column('source_type', sa.String(length=20), nullable=False, server_default='primary'),
+        sa.Column('access_level', sa.String(length=20), nullable=True),
+        sa.Column('is_cross_dept', sa.Boolean(), nullable=True, server_default=sa.false()),
+        sa.Column('file_type', sa.String(length=20), nullable=True),
+        sa.Column('file_hash', sa.String(length=64), nullable=True),
+        sa.Column('uploaded_by', sa.Integer(), nullable=True),
+        sa.Column('feedback_id', sa.Integer(), nullable=True),
+        sa.Column('page_count', sa.Integer(), nullable=True),
+        sa.Column('chunk_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('first_chunk_id', sa.Integer(), nullable=True),
+        sa.Column('last_chunk_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['uploaded_by'], ['user.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('department', 'file_name', 'source_type', name='uq_documents_dept_file_source')
+    )
+
+    # Upload dedupe looks files up by content hash
+    op.create_index('idx_documents_file_hash', 'documents', ['file_hash'], unique=False)
+    op.create_index('idx_documents_source_created', 'documents', ['source_type', 'created_at'], unique=False)
+
+    # Backfill from existing chunks. Files uploaded as one multi-file batch before
+    # this migration were stored under a single joined file_name and stay one entry.
+    op.execute("""
+        INSERT INTO documents
+            (department, file_name, source_type, access_level, is_cross_dept, file_type,
+             file_hash, uploaded_by, feedback_id, chunk_count, first_chunk_id, last_chunk_id,
+             created_at, updated_at)
+        SELECT department, file_name, source_type,
+               MIN(access_level), bool_or(is_cross_dept), MIN(file_type),
+               MIN(file_hash), MIN(uploaded_by), MIN(feedback_id),
+               COUNT(*), MIN(id), MAX(id), MIN(created_at), MAX(created_at)
+        FROM document_embeddings
+        WHERE file_name IS NOT NULL
+        GROUP BY department, file_name, source_type
+    """)
+
+    # Added on the partitioned parent, so every partition gets the column and index
+    op.execute("""
+        ALTER TABLE document_embeddings
+        ADD COLUMN IF NOT EXISTS document_id integer
+        REFERENCES documents (id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        UPDATE document_embeddings e
+        SET document_id = d.id
+        FROM documents d
+        WHERE e.department = d.department
+          AND e.file_name = d.file_name
+          AND e.source_type = d.source_type
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_document_embeddings_document_id
+        ON document_embeddings (document_id, id)
+    """)
+
+    op.execute("ANALYZE documents")
+    op.execute("ANALYZE document_embeddings")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_document_id")
+    op.execute("ALTER TABLE document_embeddings DROP COLUMN IF EXISTS document_id")
+    op.drop_index('idx_documents_source_created', table_name='documents')
+    op.drop_index('idx_documents_file_hash', table_name='documents')
+    op.drop_table('documents')
@@ -0,0 +1,41 @@
+"""add HNSW ANN index on document_embeddings.embedding
+
+Revision ID: b4e9d27c1f53
+Revises: 8f2c6a1d4e07
+Create Date: 2026-10-18 12:40:51.377820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e9d27c1f53'
+down_revision = '8f2c6a1d4e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NOTE: ANN indexes need a fixed-dimension column, e.g. vector(1536).
+    # Cosine ops match the `embedding <=> :vec` ordering used by retrieval.
+    # To switch to IVFFlat or change build parameters later, use
+    # `python rebuild_vector_index.py --type ivfflat` (src/vector_index.py).
+    op.execute("SET maintenance_work_mem = '512MB'")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_document_embeddings_embedding_ann
+        ON document_embeddings
+        USING hnsw (embedding vector_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """)
+
+    # Pre-filter columns shared by every retrieval query
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_document_embeddings_source_dept
+        ON document_embeddings (source_type, department, access_level)
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_source_dept")
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_embedding_ann")
@@ -0,0 +1,101 @@
+"""keep documents chunk stats current with triggers and add document_summary view
+
+Revision ID: b8d4f27a6e13
+Revises: a6c2e94f1b07
+Create Date: 2026-10-18 18:41:09.284517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f27a6e13'
+down_revision = 'a6c2e94f1b07'
+branch_labels = None
+depends_on = None
+
+STATS_TRIGGERS = {
+    'trg_document_embeddings_stats_insert': "AFTER INSERT ON document_embeddings REFERENCING NEW TABLE AS new_rows",
+    'trg_document_embeddings_stats_delete': "AFTER DELETE ON document_embeddings REFERENCING OLD TABLE AS old_rows",
+    'trg_document_embeddings_stats_update': ("AFTER UPDATE ON document_embeddings "
+                                             "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+}
+
+
+def upgrade():
+    # Statement-level: one recount per affected document per statement (an index-only
+    # scan on (document_id, id)), however many chunks the statement touched. Works on
+    # the partitioned parent, so inserts and deletes in every partition are covered.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION documents_sync_chunk_stats() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            doc_ids integer[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                SELECT array_agg(DISTINCT document_id) INTO doc_ids
+                FROM new_rows WHERE document_id IS NOT NULL;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT array_agg(DISTINCT document_id) INTO doc_ids
+                FROM old_rows WHERE document_id IS NOT NULL;
+            ELSE
+                SELECT array_agg(DISTINCT changed.document_id) INTO doc_ids
+                FROM (SELECT document_id FROM old_rows
+                      UNION
+                      SELECT document_id FROM new_rows) changed
+                WHERE changed.document_id IS NOT NULL;
+            END IF;
+
+            IF doc_ids IS NULL THEN
+                RETURN NULL;
+            END IF;
+
+            UPDATE documents d
+            SET chunk_count = s.chunk_count,
+                first_chunk_id = s.first_chunk_id,
+                last_chunk_id = s.last_chunk_id,
+                updated_at = now()
+            FROM unnest(doc_ids) AS ids(id)
+            CROSS JOIN LATERAL (
+                SELECT COUNT(*) AS chunk_count, MIN(e.id) AS first_chunk_id, MAX(e.id) AS last_chunk_id
+                FROM document_embeddings e
+                WHERE e.document_id = ids.id
+            ) s
+            WHERE d.id = ids.id;
+
+            RETURN NULL;
+        END;
+        $$
+    """)
+
+    for name, timing in STATS_TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER {name}
+            {timing}
+            FOR EACH STATEMENT EXECUTE FUNCTION documents_sync_chunk_stats()
+        """)
+
+    # What the admin document pages list: the catalog plus the uploader's display name
+    op.execute("""
+        CREATE OR REPLACE VIEW document_summary AS
+        SELECT
+            d.id, d.department, d.file_name, d.source_type, d.access_level, d.is_cross_dept,
+            d.file_type, d.file_hash, d.uploaded_by, d.feedback_id, d.page_count,
+            d.chunk_count, d.first_chunk_id, d.last_chunk_id, d.created_at, d.updated_at,
+            COALESCE(NULLIF(u.name, ''), u.email, 'Unknown') AS uploaded_by_name
+        FROM documents d
+        LEFT JOIN "user" u ON u.id = d.uploaded_by
+    """)
+
+    # Newest-first listing, optionally filtered to one department
+    op.create_index('idx_documents_source_dept_created', 'documents',
+                    ['source_type', 'department', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_documents_source_dept_created', table_name='documents')
+    op.execute("DROP VIEW IF EXISTS document_summary")
+    for name in STATS_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON document_embeddings")
+    op.execute("DROP FUNCTION IF EXISTS documents_sync_chunk_stats()")
@@ -0,0 +1,184 @@
+"""partition document_embeddings by source_type and department
+
+Revision ID: d7a3f0c9e218
+Revises: b4e9d27c1f53
+Create Date: 2026-10-18 14:05:33.620947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f0c9e218'
+down_revision = 'b4e9d27c1f53'
+branch_labels = None
+depends_on = None
+
+CROSS_DEPT_PARTITION = '_cross_dept'
+
+COLUMNS = """
+    id, department, content, metadata, embedding, access_level, is_cross_dept,
+    source_type, uploaded_by, file_name, file_type, feedback_id, file_hash, created_at
+"""
+
+
+def _department_partition_name(department):
+    # Must match src/partitions.py:department_partition_name
+    slug = re.sub(r'[^a-z0-9_]', '_', department.lower())[:30]
+    digest = hashlib.md5(department.encode('utf-8')).hexdigest()[:8]
+    return f"document_embeddings_p_{slug}_{digest}"
+
+
+def _quote_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _create_indexes(table):
+    op.execute("SET maintenance_work_mem = '512MB'")
+    op.execute(f"""
+        CREATE INDEX idx_document_embeddings_embedding_ann
+        ON {table} USING hnsw (embedding vector_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """)
+    op.execute(f"CREATE INDEX idx_document_embeddings_content_tsv ON {table} USING GIN (content_tsv)")
+    op.execute(f"""
+        CREATE INDEX idx_document_embeddings_source_dept
+        ON {table} (source_type, department, access_level)
+    """)
+
+
+def _drop_indexes():
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_embedding_ann")
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_content_tsv")
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_source_dept")
+
+
+def _embedding_type(bind):
+    return bind.execute(sa.text("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = 'document_embeddings'::regclass AND attname = 'embedding'
+    """)).scalar() or 'vector(1536)'
+
+
+def upgrade():
+    bind = op.get_bind()
+    embedding_type = _embedding_type(bind)
+
+    # Move the old table aside (its index/constraint names are reused below)
+    _drop_indexes()
+    op.execute("ALTER TABLE document_embeddings RENAME TO document_embeddings_legacy")
+    op.execute("ALTER INDEX IF EXISTS document_embeddings_pkey RENAME TO document_embeddings_legacy_pkey")
+
+    op.execute("CREATE SEQUENCE IF NOT EXISTS document_embeddings_partitioned_id_seq")
+    op.execute(f"""
+        CREATE TABLE document_embeddings (
+            id integer NOT NULL DEFAULT nextval('document_embeddings_partitioned_id_seq'),
+            department varchar(50) NOT NULL,
+            dept_partition varchar(50) NOT NULL,
+            content text NOT NULL,
+            metadata jsonb DEFAULT '{{}}'::jsonb,
+            embedding {embedding_type} NOT NULL,
+            access_level varchar(20) DEFAULT 'public',
+            is_cross_dept boolean DEFAULT false,
+            source_type varchar(20) NOT NULL DEFAULT 'primary',
+            uploaded_by integer,
+            file_name text,
+            file_type varchar(20),
+            feedback_id integer,
+            file_hash varchar(64),
+            created_at timestamp DEFAULT now(),
+            content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED,
+            PRIMARY KEY (id, source_type, dept_partition)
+        ) PARTITION BY LIST (source_type)
+    """)
+    op.execute("ALTER SEQUENCE document_embeddings_partitioned_id_seq OWNED BY document_embeddings.id")
+
+    # Primary KB: one partition per department plus a shared cross-department partition
+    op.execute("""
+        CREATE TABLE document_embeddings_primary PARTITION OF document_embeddings
+        FOR VALUES IN ('primary') PARTITION BY LIST (dept_partition)
+    """)
+    op.execute(f"""
+        CREATE TABLE document_embeddings_cross_dept PARTITION OF document_embeddings_primary
+        FOR VALUES IN ({_quote_literal(CROSS_DEPT_PARTITION)})
+    """)
+    op.execute("CREATE TABLE document_embeddings_primary_default PARTITION OF document_embeddings_primary DEFAULT")
+
+    departments = bind.execute(sa.text("""
+        SELECT DISTINCT department FROM document_embeddings_legacy
+        WHERE COALESCE(source_type, 'primary') = 'primary'
+          AND NOT COALESCE(is_cross_dept, false)
+          AND department IS NOT NULL
+    """)).fetchall()
+    for (department,) in departments:
+        op.execute(f"""
+            CREATE TABLE {_department_partition_name(department)} PARTITION OF document_embeddings_primary
+            FOR VALUES IN ({_quote_literal(department)})
+        """)
+
+    # Secondary KB (approved feedback) is small and searched across departments
+    op.execute("CREATE TABLE document_embeddings_secondary PARTITION OF document_embeddings FOR VALUES IN ('secondary')")
+    op.execute("CREATE TABLE document_embeddings_other PARTITION OF document_embeddings DEFAULT")
+
+    op.execute(f"""
+        INSERT INTO document_embeddings ({COLUMNS}, dept_partition)
+        SELECT
+            id, department, content, metadata, embedding, access_level,
+            COALESCE(is_cross_dept, false), COALESCE(source_type, 'primary'),
+            uploaded_by, file_name, file_type, feedback_id, file_hash, created_at,
+            CASE WHEN COALESCE(is_cross_dept, false) THEN {_quote_literal(CROSS_DEPT_PARTITION)} ELSE department END
+        FROM document_embeddings_legacy
+    """)
+    op.execute("""
+        SELECT setval('document_embeddings_partitioned_id_seq',
+                      COALESCE((SELECT MAX(id) FROM document_embeddings), 0) + 1, false)
+    """)
+
+    # Created on the parent, so every partition (including ones added later) gets its own copy
+    _create_indexes('document_embeddings')
+
+    op.execute("DROP TABLE document_embeddings_legacy")
+    op.execute("ANALYZE document_embeddings")
+
+
+def downgrade():
+    bind = op.get_bind()
+    embedding_type = _embedding_type(bind)
+
+    _drop_indexes()
+    op.execute("ALTER TABLE document_embeddings RENAME TO document_embeddings_partitioned")
+    op.execute("ALTER INDEX IF EXISTS document_embeddings_pkey RENAME TO document_embeddings_partitioned_pkey")
+
+    op.execute(f"""
+        CREATE TABLE document_embeddings (
+            id serial PRIMARY KEY,
+            department varchar(50) NOT NULL,
+            content text NOT NULL,
+            metadata jsonb DEFAULT '{{}}'::jsonb,
+            embedding {embedding_type} NOT NULL,
+            access_level varchar(20) DEFAULT 'public',
+            is_cross_dept boolean DEFAULT false,
+            source_type varchar(20) DEFAULT 'primary',
+            uploaded_by integer,
+            file_name text,
+            file_type varchar(20),
+            feedback_id integer,
+            file_hash varchar(64),
+            created_at timestamp DEFAULT now(),
+            content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+        )
+    """)
+    op.execute(f"INSERT INTO document_embeddings ({COLUMNS}) SELECT {COLUMNS} FROM document_embeddings_partitioned")
+    op.execute("""
+        SELECT setval('document_embeddings_id_seq',
+                      COALESCE((SELECT MAX(id) FROM document_embeddings), 0) + 1, false)
+    """)
+
+    _create_indexes('document_embeddings')
+
+    op.execute("DROP TABLE document_embeddings_partitioned CASCADE")
+    op.execute("ANALYZE document_embeddings")
@@ -0,0 +1,40 @@
+"""add chunk_hash column and (department, file_name) index to document_embeddings
+
+Revision ID: e91b5c4a7d30
+Revises: d7a3f0c9e218
+Create Date: 2026-10-18 16:40:27.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e91b5c4a7d30'
+down_revision = 'd7a3f0c9e218'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generated STORED column (same pattern as content_tsv): existing rows are
+    # backfilled by the table rewrite, new rows need no application changes.
+    # Used to diff a re-uploaded file against its stored chunks.
+    op.execute("""
+        ALTER TABLE document_embeddings
+        ADD COLUMN IF NOT EXISTS chunk_hash text
+        GENERATED ALWAYS AS (md5(coalesce(content, ''))) STORED
+    """)
+
+    # Finds the stored chunks of a file when a new version is uploaded
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_document_embeddings_dept_file
+        ON document_embeddings (department, file_name)
+    """)
+
+    op.execute("ANALYZE document_embeddings")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_document_embeddings_dept_file")
+    op.execute("ALTER TABLE document_embeddings DROP COLUMN IF EXISTS chunk_hash")
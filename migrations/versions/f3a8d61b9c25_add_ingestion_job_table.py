@@ -0,0 +1,50 @@
+"""add ingestion_job table for background uploads
+
+Revision ID: f3a8d61b9c25
+Revises: e91b5c4a7d30
+Create Date: 2026-10-18 17:25:03.441870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d61b9c25'
+down_revision = 'e91b5c4a7d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ingestion_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('department', sa.String(length=50), nullable=False),
+        sa.Column('access_level', sa.String(length=20), nullable=True),
+        sa.Column('is_cross_dept', sa.Boolean(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('stage', sa.String(length=20), nullable=True),
+        sa.Column('files', sa.JSON(), nullable=True),
+        sa.Column('skipped_files', sa.JSON(), nullable=True),
+        sa.Column('chunks_total', sa.Integer(), nullable=True),
+        sa.Column('chunks_done', sa.Integer(), nullable=True),
+        sa.Column('vectors_stored', sa.Integer(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Workers claim the oldest queued job; crash recovery scans running jobs by heartbeat
+    op.create_index('idx_ingestion_job_status', 'ingestion_job', ['status', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_ingestion_job_status', table_name='ingestion_job')
+    op.drop_table('ingestion_job')
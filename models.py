@@ -130,4 +130,58 @@ class AdminActivityLog(db.Model):
     admin = db.relationship('User', backref='activity_logs')
     
     def __repr__(self):
-        return f'<AdminActivityLog {self.id}: {self.action_type}>'
\ No newline at end of file
+        return f'<AdminActivityLog {self.id}: {self.action_type}>'
+
+class IngestionJob(db.Model):
+    __tablename__ = 'ingestion_job'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    department = db.Column(db.String(50), nullable=False)
+    access_level = db.Column(db.String(20), default='public')
+    is_cross_dept = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), default='queued')   # queued, running, completed, failed
+    stage = db.Column(db.String(20), default='queued')    # queued, parsing, embedding, storing, analyzing, done
+    files = db.Column(db.JSON, default=list)              # [{filename, file_hash, status, chunks, vectors, ...}]
+    skipped_files = db.Column(db.JSON, default=list)
+    chunks_total = db.Column(db.Integer, default=0)
+    chunks_done = db.Column(db.Integer, default=0)
+    vectors_stored = db.Column(db.Integer, default=0)
+    attempts = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    # Relationship
+    creator = db.relationship('User', foreign_keys=[created_by], backref='ingestion_jobs')
+    
+    def to_dict(self):
+        """Progress report for /admin/upload/jobs/<id>"""
+        end = self.finished_at or datetime.utcnow()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+        files = self.files or []
+        return {
+            'id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'department': self.department,
+            'files': files,
+            'files_total': len(files),
+            'files_done': sum(1 for f in files if f.get('status') == 'done'),
+            'skipped_files': self.skipped_files or [],
+            'chunks_total': self.chunks_total,
+            'chunks_done': self.chunks_done,
+            'vectors_stored': self.vectors_stored,
+            'chunks_per_second': round(self.chunks_done / elapsed, 1) if elapsed > 0 else 0.0,
+            'elapsed_seconds': round(elapsed, 1),
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<IngestionJob {self.id}: {self.status}>'
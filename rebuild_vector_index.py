@@ -0,0 +1,23 @@
+"""
+Rebuild the ANN index on document_embeddings (run after bulk uploads)
+
+Usage:
+    python rebuild_vector_index.py [--type hnsw|ivfflat]
+"""
+
+import argparse
+from app import app
+from src.vector_index import get_ann_index_info, rebuild_ann_index
+
+parser = argparse.ArgumentParser(description="Rebuild the document_embeddings ANN index")
+parser.add_argument("--type", choices=["hnsw", "ivfflat"], help="Index type (default: VECTOR_INDEX_TYPE)")
+args = parser.parse_args()
+
+with app.app_context():
+    before = get_ann_index_info()
+    print(f"Current index: {before['type'] or 'none'} ({before['size'] or '-'})")
+
+    result = rebuild_ann_index(args.type)
+
+    after = result['index']
+    print(f"New index: {after['type']} ({after['size']}), built in {result['seconds']}s")
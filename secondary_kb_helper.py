@@ -260,7 +260,7 @@ Converts approved user feedback into searchable vector embeddings
 from extensions import db
 from models import UserFeedback
 from src.embeddings import EmbeddingPipeline
-from src.pg_vectorstore import PostgresVectorStore
+from src.pg_vectorstore import PostgresVectorStore, on_department_data_changed
 from langchain.schema import Document
 import json
 from datetime import datetime
@@ -355,7 +355,7 @@ class SecondaryKBHelper:
                             is_cross_dept
                         FROM document_embeddings
                         WHERE source_type = 'primary'
-                          AND (department = :dept OR is_cross_dept = true)
+                          AND dept_partition IN (:dept, '_cross_dept')
                         LIMIT 1
                     """), {"dept": user_dept}).fetchone()
                     
@@ -426,11 +426,18 @@ class SecondaryKBHelper:
                 """),
                 {"fid": feedback_id}
             )
+            db.session.execute(
+                text("DELETE FROM documents WHERE feedback_id = :fid AND source_type = 'secondary'"),
+                {"fid": feedback_id}
+            )
             db.session.commit()
-            
+
             removed_count = result.rowcount
             print(f"🗑️ Removed {removed_count} vectors for feedback #{feedback_id}")
             
+            # Secondary KB chunks are searched by every department
+            on_department_data_changed(None, affects_all_departments=True)
+            
             return {
                 "status": "success",
                 "removed_count": removed_count
@@ -0,0 +1,49 @@
+"""
+Bounded registry of per-session chatbots
+
+Replaces the unbounded ``chatbot_instances`` dict in app.py. Sessions are kept
+in an LRU map with an idle timeout, so long-running gunicorn workers no longer
+grow without limit. Every RAGChatbot shares the process-wide LLM and embedding
+clients and keeps its history in src/conversation_store.py, so per session
+only the store (department + user) is held here.
+"""
+
+from config import Config
+from src.query_cache import TTLLRUCache
+
+
+class ChatbotRegistry:
+    """LRU + idle-TTL map of session key -> RAGChatbot with size/hit/eviction counters"""
+
+    def __init__(self, maxsize=500, idle_ttl=1800):
+        self._bots = TTLLRUCache(maxsize=maxsize, ttl=idle_ttl, sliding=True)
+
+    @staticmethod
+    def make_key(user_id, session_id):
+        return f"{user_id}_{session_id}"
+
+    def get(self, key):
+        return self._bots.get(key)
+
+    def put(self, key, bot):
+        self._bots.set(key, bot)
+
+    def discard(self, key):
+        self._bots.pop(key)
+
+    def discard_prefix(self, prefix):
+        """Drop every session whose key starts with prefix (e.g. all of a user's sessions)"""
+        return self._bots.invalidate_where(lambda key: key.startswith(prefix))
+
+    def __len__(self):
+        return len(self._bots)
+
+    def stats(self):
+        return self._bots.stats()
+
+
+# Process-wide registry used by the chat routes
+chatbot_registry = ChatbotRegistry(
+    maxsize=Config.CHATBOT_REGISTRY_SIZE,
+    idle_ttl=Config.CHATBOT_IDLE_TTL
+)
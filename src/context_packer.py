@@ -0,0 +1,151 @@
+"""
+Token-budgeted context packing for the RAG prompt
+
+Chunks come from RecursiveCharacterTextSplitter with chunk_overlap=100, so
+neighbouring chunks of the same file repeat text. pack_context() drops that
+repeated text (only between chunks of the same file, so boilerplate shared by
+unrelated documents is kept), fills a token budget and a chunk limit with
+chunks in rank order and trims the
+previous exchange (minus its <small>Source:</small> HTML) to its own budget.
+Tokens are counted with tiktoken; if the encoding is unavailable (e.g. no
+network to fetch the BPE file) a ~4 characters per token estimate is used.
+"""
+
+import re
+from config import Config
+
+import tiktoken
+
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400  # Splitter overlap is 100 chars; leave room for whitespace differences
+MIN_PARTIAL_CHUNK_TOKENS = 50  # Don't bother packing a tail fragment smaller than this
+
+_SOURCE_HTML_RE = re.compile(r"\s*<small>Source:.*?</small>", re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding(Config.CONTEXT_TOKEN_ENCODING)
+        except Exception as e:
+            print(f"⚠️ tiktoken encoding unavailable, estimating token counts: {e}")
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text, max_tokens):
+    """Cut text to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def strip_source_html(answer):
+    """Remove the appended source lines and any remaining HTML from a stored answer"""
+    return _TAG_RE.sub("", _SOURCE_HTML_RE.sub("", answer)).strip()
+
+
+def _remove_overlap(text, kept):
+    """
+    Drop text already covered by kept chunks (containment or splitter overlap at either end)
+
+    kept should only hold earlier chunks of the same file: a shared prefix or
+    suffix is only splitter overlap between neighbours of one file.
+    """
+    for other in kept:
+        if text in other:
+            return ""
+        limit = min(len(text), len(other), MAX_OVERLAP_CHARS)
+        for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if other.endswith(text[:size]):
+                text = text[size:].lstrip()
+                break
+        limit = min(len(text), len(other), MAX_OVERLAP_CHARS)
+        for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if other.startswith(text[-size:]):
+                text = text[:-size].rstrip()
+                break
+    return text
+
+
+def pack_context(docs, history, max_chunks=None, context_budget=None, history_budget=None):
+    """
+    Build the context and previous-conversation blocks within token budgets
+
+    Args:
+        docs: Retrieved documents, best first
+        history: Recent (question, answer) turns, oldest first (only the last is used)
+
+    Returns:
+        dict: context, recent_context, used_docs (docs that contributed text),
+              context_tokens, history_tokens, deduped_chars
+    """
+    max_chunks = max_chunks or Config.CONTEXT_MAX_CHUNKS
+    context_budget = context_budget or Config.CONTEXT_TOKEN_BUDGET
+    history_budget = history_budget if history_budget is not None else Config.CONTEXT_HISTORY_TOKEN_BUDGET
+
+    kept_texts, used_docs = [], []
+    kept_by_file = {}
+    context_tokens = deduped_chars = 0
+    # Duplicates and fully-overlapping chunks are skipped without using a slot,
+    # so later candidates can still fill max_chunks
+    for doc in docs:
+        remaining = context_budget - context_tokens
+        if len(kept_texts) >= max_chunks or (kept_texts and remaining < MIN_PARTIAL_CHUNK_TOKENS):
+            break
+
+        original = doc.page_content.strip()
+        file_name = doc.metadata.get('file_name')
+        if original in kept_texts:
+            text = ""
+        else:
+            text = _remove_overlap(original, kept_by_file.get(file_name, []) if file_name else [])
+        deduped_chars += len(original) - len(text)
+        if not text:
+            continue
+
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            # The top chunk is always sent, truncated if need be - never an empty context
+            remaining = remaining if kept_texts else max(remaining, MIN_PARTIAL_CHUNK_TOKENS)
+            text = truncate_tokens(text, remaining)
+            tokens = min(tokens, remaining)
+
+        kept_texts.append(text)
+        if file_name:
+            kept_by_file.setdefault(file_name, []).append(original)
+        used_docs.append(doc)
+        context_tokens += tokens
+
+    recent_context = ""
+    history_tokens = 0
+    if history and history_budget > 0:
+        last_question, last_answer = history[-1]
+        exchange = f"Q: {last_question}\nA: {strip_source_html(last_answer)}"
+        exchange = truncate_tokens(exchange, history_budget)
+        history_tokens = count_tokens(exchange)
+        recent_context = "Previous conversation:\n" + exchange + "\n\n"
+
+    return {
+        "context": "\n\n".join(kept_texts),
+        "recent_context": recent_context,
+        "used_docs": used_docs,
+        "context_tokens": context_tokens,
+        "history_tokens": history_tokens,
+        "deduped_chars": deduped_chars
+    }
@@ -0,0 +1,121 @@
+"""
+Conversation-state store: the last N (question, answer) turns per chat session
+
+RAGChatbot reads and writes its history here instead of keeping a private
+list, so any gunicorn worker can pick up any session. The in-memory store is
+per process; with CONVERSATION_STORE_URL set, a Redis list per session
+(RPUSH + LTRIM) is shared by every worker and loads in one round trip.
+"""
+
+import json
+from config import Config
+from src.query_cache import TTLLRUCache
+
+try:
+    import redis  # Optional: only needed for the shared backend
+except ImportError:
+    redis = None
+
+
+class InMemoryConversationStore:
+    """Per-process store; sessions idle longer than ttl are dropped"""
+
+    backend = "memory"
+
+    def __init__(self, max_turns=5, maxsize=5000, ttl=86400):
+        self.max_turns = max_turns
+        self._sessions = TTLLRUCache(maxsize=maxsize, ttl=ttl, sliding=True)
+
+    def get(self, session_key):
+        """Recent turns oldest first, or None if the session is not in the store"""
+        turns = self._sessions.get(session_key)
+        return list(turns) if turns is not None else None
+
+    def set(self, session_key, turns):
+        self._sessions.set(session_key, list(turns)[-self.max_turns:])
+
+    def append(self, session_key, question, answer):
+        turns = self._sessions.get(session_key) or []
+        self._sessions.set(session_key, (turns + [(question, answer)])[-self.max_turns:])
+
+    def clear(self, session_key):
+        self._sessions.pop(session_key)
+
+    def stats(self):
+        stats = self._sessions.stats()
+        stats["backend"] = self.backend
+        return stats
+
+
+class RedisConversationStore:
+    """Shared store: one capped Redis list per session plus a 'loaded' marker"""
+
+    backend = "redis"
+
+    def __init__(self, url, max_turns=5, ttl=86400):
+        self.client = redis.Redis.from_url(url)
+        self.max_turns = max_turns
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(session_key):
+        # The marker distinguishes "loaded, no turns yet" from "never loaded"
+        return f"conv:{session_key}", f"conv:{session_key}:loaded"
+
+    def get(self, session_key):
+        key, marker = self._keys(session_key)
+        pipe = self.client.pipeline()
+        pipe.exists(marker)
+        pipe.lrange(key, -self.max_turns, -1)
+        loaded, raw = pipe.execute()
+        if not loaded:
+            return None
+        return [tuple(json.loads(item)) for item in raw]
+
+    def set(self, session_key, turns):
+        key, marker = self._keys(session_key)
+        turns = list(turns)[-self.max_turns:]
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        if turns:
+            pipe.rpush(key, *[json.dumps(list(t)) for t in turns])
+            pipe.expire(key, self.ttl)
+        pipe.set(marker, 1, ex=self.ttl)
+        pipe.execute()
+
+    def append(self, session_key, question, answer):
+        key, marker = self._keys(session_key)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, json.dumps([question, answer]))
+        pipe.ltrim(key, -self.max_turns, -1)
+        pipe.expire(key, self.ttl)
+        pipe.set(marker, 1, ex=self.ttl)
+        pipe.execute()
+
+    def clear(self, session_key):
+        self.client.delete(*self._keys(session_key))
+
+    def stats(self):
+        return {"backend": self.backend, "max_turns": self.max_turns, "ttl": self.ttl}
+
+
+def create_conversation_store():
+    """Redis-backed store when configured and available, in-memory otherwise"""
+    if Config.CONVERSATION_STORE_URL:
+        if redis is None:
+            print("⚠️ CONVERSATION_STORE_URL set but the 'redis' package is not installed - using in-memory store")
+        else:
+            return RedisConversationStore(
+                Config.CONVERSATION_STORE_URL,
+                max_turns=Config.CONVERSATION_HISTORY_TURNS,
+                ttl=Config.CONVERSATION_STORE_TTL
+            )
+    return InMemoryConversationStore(
+        max_turns=Config.CONVERSATION_HISTORY_TURNS,
+        maxsize=Config.CONVERSATION_STORE_SIZE,
+        ttl=Config.CONVERSATION_STORE_TTL
+    )
+
+
+# Process-wide store used by every RAGChatbot
+conversation_store = create_conversation_store()
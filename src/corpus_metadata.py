@@ -0,0 +1,100 @@
+"""
+Per-department Primary KB metadata cache (exists flag, chunk count, last modified)
+
+/chat used to run a COUNT(*) over the department's chunks on every message
+just to decide whether any documents exist. Entries here are keyed by
+dept_partition ('_cross_dept' for cross-department chunks), loaded with one
+grouped query on a miss and kept current by PostgresVectorStore writes.
+
+The TTL bounds staleness for writes made by other worker processes. "No
+documents" results use a much shorter TTL, so a department's first upload is
+picked up by every process within seconds rather than minutes.
+"""
+
+from datetime import datetime
+from sqlalchemy import text
+from config import Config
+from extensions import db
+from src.partitions import CROSS_DEPT_PARTITION
+from src.query_cache import TTLLRUCache
+
+
+class CorpusMetadataCache:
+    """dept_partition -> {'exists', 'chunk_count', 'last_modified'}"""
+
+    def __init__(self, maxsize=1024, ttl=300, negative_ttl=10):
+        self.entries = TTLLRUCache(maxsize=maxsize, ttl=ttl)
+        self.negative_ttl = negative_ttl
+
+    @staticmethod
+    def _empty():
+        return {"exists": False, "chunk_count": 0, "last_modified": None}
+
+    def _load(self, department):
+        """Fetch metadata for the department and the cross-department partition in one query"""
+        rows = db.session.execute(text("""
+            SELECT dept_partition, COUNT(*) AS chunk_count, MAX(created_at) AS last_modified
+            FROM document_embeddings
+            WHERE source_type = 'primary'
+              AND dept_partition IN (:dept, :cross)
+            GROUP BY dept_partition
+        """), {"dept": department, "cross": CROSS_DEPT_PARTITION}).fetchall()
+
+        loaded = {department: self._empty(), CROSS_DEPT_PARTITION: self._empty()}
+        for row in rows:
+            loaded[row.dept_partition] = {
+                "exists": row.chunk_count > 0,
+                "chunk_count": row.chunk_count,
+                "last_modified": row.last_modified
+            }
+        for partition, meta in loaded.items():
+            self.entries.set(partition, meta, ttl=None if meta["exists"] else self.negative_ttl)
+        return loaded
+
+    def get(self, partition):
+        """Metadata for one dept_partition value, loading it on a miss"""
+        meta = self.entries.get(partition)
+        if meta is None:
+            meta = self._load(partition)[partition]
+        return dict(meta)
+
+    def has_documents(self, department):
+        """True if the department can search any Primary KB chunks (its own or cross-department)"""
+        own = self.entries.get(department)
+        if own is not None and own["exists"]:
+            # Don't let the short-lived "no cross-dept chunks" entry force reloads
+            return True
+        cross = self.entries.get(CROSS_DEPT_PARTITION)
+        if own is None or cross is None:
+            loaded = self._load(department)
+            own, cross = loaded[department], loaded[CROSS_DEPT_PARTITION]
+        return own["exists"] or cross["exists"]
+
+    def record_added(self, partition, chunk_count):
+        """Apply a successful insert to a cached entry (a missing entry is loaded lazily later)"""
+        meta = self.entries.get(partition)
+        if meta is None or chunk_count <= 0:
+            return
+        self.entries.set(partition, {
+            "exists": True,
+            "chunk_count": meta["chunk_count"] + chunk_count,
+            "last_modified": datetime.utcnow()
+        })
+
+    def invalidate(self, department=None, include_cross_dept=False):
+        """Drop cached entries so the next lookup reloads them"""
+        if department is not None:
+            self.entries.pop(department)
+        if include_cross_dept:
+            self.entries.pop(CROSS_DEPT_PARTITION)
+
+    def stats(self):
+        return self.entries.stats()
+
+
+# Process-wide cache consulted by /chat and maintained by PostgresVectorStore
+corpus_metadata = CorpusMetadataCache(
+    maxsize=Config.CORPUS_METADATA_CACHE_SIZE,
+    ttl=Config.CORPUS_METADATA_CACHE_TTL,
+    negative_ttl=Config.CORPUS_METADATA_NEGATIVE_TTL
+)
@@ -1,17 +1,47 @@
 from pathlib import Path
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     PyPDFLoader, TextLoader, CSVLoader, Docx2txtLoader
 )
 
+def _loader_for(file):
+    if file.suffix == ".pdf":
+        return PyPDFLoader(str(file))
+    elif file.suffix == ".txt":
+        return TextLoader(str(file))
+    elif file.suffix == ".csv":
+        return CSVLoader(str(file))
+    elif file.suffix == ".docx":
+        return Docx2txtLoader(str(file))
+    return None
+
+def iter_pages(file_path):
+    """Yield a file's Documents (PDF pages, CSV rows, ...) one at a time"""
+    loader = _loader_for(Path(file_path))
+    if loader is not None:
+        yield from loader.lazy_load()
+
+def load_file(file_path):
+    """Load one file into Documents (empty list for unsupported types)"""
+    return list(iter_pages(file_path))
+
+def split_file(file_path, chunk_size, chunk_overlap):
+    """
+    Parse and split one file, streaming pages into the splitter
+    
+    Runs in ingestion worker processes; only the chunks are kept, never the
+    full page list. Returns (chunks, page_count).
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    pages = 0
+    for page in iter_pages(file_path):
+        pages += 1
+        chunks.extend(splitter.split_documents([page]))
+    return chunks, pages
+
 def load_documents(folder_path):
     documents = []
     for file in Path(folder_path).glob("*"):
-        if file.suffix == ".pdf":
-            documents.extend(PyPDFLoader(str(file)).load())
-        elif file.suffix == ".txt":
-            documents.extend(TextLoader(str(file)).load())
-        elif file.suffix == ".csv":
-            documents.extend(CSVLoader(str(file)).load())
-        elif file.suffix == ".docx":
-            documents.extend(Docx2txtLoader(str(file)).load())
-    return documents
\ No newline at end of file
+        documents.extend(load_file(file))
+    return documents
@@ -0,0 +1,210 @@
+"""
+Per-file catalog of stored documents
+
+Every stored file (and every approved feedback entry in the Secondary KB) has
+one row in `documents`; its chunks in document_embeddings point back to it via
+document_id (ON DELETE CASCADE). Dedupe, listings and deletes work on this
+small table instead of grouping or scanning the chunks.
+
+The chunk_count / first_chunk_id / last_chunk_id columns are kept current by
+statement-level triggers on document_embeddings (migration b8d4f27a6e13), and
+the document_summary view adds the uploader's name for the admin pages.
+"""
+
+from extensions import db
+from sqlalchemy import text
+
+
+def upsert_document(department, file_name, source_type='primary', access_level='public',
+                    is_cross_dept=False, file_type=None, file_hash=None, uploaded_by=None,
+                    feedback_id=None, page_count=None):
+    """
+    Create or update the catalog row for a file (in the caller's transaction)
+
+    Returns:
+        int: documents.id
+    """
+    return db.session.execute(
+        text("""
+            INSERT INTO documents
+                (department, file_name, source_type, access_level, is_cross_dept,
+                 file_type, file_hash, uploaded_by, feedback_id, page_count)
+            VALUES
+                (:dept, :fname, :source, :access, :cross, :ftype, :fhash, :uploader, :fid, :pages)
+            ON CONFLICT (department, file_name, source_type) DO UPDATE SET
+                access_level = EXCLUDED.access_level,
+                is_cross_dept = EXCLUDED.is_cross_dept,
+                file_type = COALESCE(EXCLUDED.file_type, documents.file_type),
+                file_hash = COALESCE(EXCLUDED.file_hash, documents.file_hash),
+                uploaded_by = COALESCE(EXCLUDED.uploaded_by, documents.uploaded_by),
+                feedback_id = COALESCE(EXCLUDED.feedback_id, documents.feedback_id),
+                page_count = COALESCE(EXCLUDED.page_count, documents.page_count),
+                updated_at = now()
+            RETURNING id
+        """),
+        {
+            "dept": department,
+            "fname": file_name,
+            "source": source_type,
+            "access": access_level,
+            "cross": is_cross_dept,
+            "ftype": file_type,
+            "fhash": file_hash,
+            "uploader": uploaded_by,
+            "fid": feedback_id,
+            "pages": page_count
+        }
+    ).scalar()
+
+
+def find_by_hashes(hashes):
+    """
+    Earliest stored document for each of the given file hashes
+
+    Returns:
+        dict: file_hash -> row (id, file_hash, file_name, department, created_at)
+    """
+    if not hashes:
+        return {}
+    rows = db.session.execute(
+        text("""
+            SELECT DISTINCT ON (file_hash) id, file_hash, file_name, department, created_at
+            FROM documents
+            WHERE file_hash = ANY(:hashes)
+            ORDER BY file_hash, created_at
+        """),
+        {"hashes": list(hashes)}
+    )
+    return {row.file_hash: row for row in rows}
+
+
+def get_document(document_id):
+    return db.session.execute(
+        text("""
+            SELECT id, department, file_name, source_type, access_level, is_cross_dept,
+                   file_type, file_hash, uploaded_by, feedback_id, page_count,
+                   chunk_count, first_chunk_id, last_chunk_id, created_at, updated_at,
+                   uploaded_by_name
+            FROM document_summary
+            WHERE id = :id
+        """),
+        {"id": document_id}
+    ).fetchone()
+
+
+def delete_document(document_id):
+    """
+    Delete a document and (via the cascade) all of its chunks, in the caller's transaction
+
+    Returns:
+        int: Number of chunks that were stored for it
+    """
+    return db.session.execute(
+        text("DELETE FROM documents WHERE id = :id RETURNING chunk_count"),
+        {"id": document_id}
+    ).scalar() or 0
+
+
+def list_documents(source_type, department=None, access_level=None, file_type=None,
+                   search=None, page=1, per_page=50):
+    """
+    One page of document_summary, newest first, filtered server-side
+
+    Returns:
+        tuple: (rows, total matching documents)
+    """
+    where = ["source_type = :source"]
+    params = {"source": source_type}
+    if department:
+        where.append("department = :dept")
+        params["dept"] = department
+    if access_level:
+        where.append("access_level = :access")
+        params["access"] = access_level
+    if file_type:
+        where.append("file_type = :ftype")
+        params["ftype"] = file_type
+    if search:
+        where.append("file_name ILIKE :search")
+        params["search"] = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    where_sql = " AND ".join(where)
+
+    total = db.session.execute(
+        text(f"SELECT COUNT(*) FROM documents WHERE {where_sql}"), params
+    ).scalar()
+    rows = db.session.execute(
+        text(f"""
+            SELECT id, file_name, department, access_level, file_type, is_cross_dept,
+                   page_count, chunk_count, created_at, uploaded_by_name
+            FROM document_summary
+            WHERE {where_sql}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit OFFSET :offset
+        """),
+        dict(params, limit=per_page, offset=(page - 1) * per_page)
+    ).fetchall()
+    return rows, total
+
+
+def list_departments(source_type):
+    return [row[0] for row in db.session.execute(
+        text("SELECT DISTINCT department FROM documents WHERE source_type = :source ORDER BY department"),
+        {"source": source_type}
+    )]
+
+
+def get_chunk_window(document_id, source_type='primary', after=None, before=None, limit=10, search=None):
+    """
+    One window of a document's chunks in id order (keyset pagination on id)
+
+    Pass after=<last id seen> for the next window or before=<first id seen> for
+    the previous one. search filters through the content_tsv full-text index.
+
+    Returns:
+        tuple: (rows, has_more) - has_more refers to the direction being paged
+    """
+    where = ["document_id = :doc_id", "source_type = :source"]
+    params = {"doc_id": document_id, "source": source_type, "limit": limit + 1}
+    if search:
+        where.append("content_tsv @@ websearch_to_tsquery('english', :search)")
+        params["search"] = search
+    if before is not None:
+        where.append("id < :before")
+        params["before"] = before
+        order = "DESC"
+    else:
+        if after is not None:
+            where.append("id > :after")
+            params["after"] = after
+        order = "ASC"
+
+    rows = db.session.execute(
+        text(f"""
+            SELECT id, content, created_at
+            FROM document_embeddings
+            WHERE {" AND ".join(where)}
+            ORDER BY id {order}
+            LIMIT :limit
+        """),
+        params
+    ).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+def count_matching_chunks(document_id, source_type, search):
+    """Number of a document's chunks matching an in-document search"""
+    return db.session.execute(
+        text("""
+            SELECT COUNT(*)
+            FROM document_embeddings
+            WHERE document_id = :doc_id
+              AND source_type = :source
+              AND content_tsv @@ websearch_to_tsquery('english', :search)
+        """),
+        {"doc_id": document_id, "source": source_type, "search": search}
+    ).scalar()
@@ -0,0 +1,197 @@
+"""
+Content-addressed embedding cache
+
+Chunk embeddings are stored in the ``embedding_cache`` table keyed by
+(embedding deployment, SHA-256 of the whitespace-normalized chunk text), so
+re-uploading an edited document or rebuilding the Secondary KB only sends the
+chunks that actually changed to Azure. The table is kept to about
+Config.EMBEDDING_CACHE_MAX_ENTRIES rows with least-recently-used eviction
+(sized from the planner's row estimate, so the bound is approximate).
+
+Every cache read/write runs in its own short transaction on a separate pooled
+connection, never on db.session: callers (e.g. PostgresVectorStore.reindex_file)
+may have uncommitted work in the session that the cache must not commit or
+roll back.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from extensions import db
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from config import Config
+from src.pg_vectorstore import PostgresVectorStore
+
+
+class EmbeddingCache:
+    """Persistent (deployment, text hash) -> vector cache with process-wide hit/miss counters"""
+
+    QUERY_BATCH_SIZE = 500
+    EVICT_BATCH_SIZE = 10000  # Most rows one put_many() deletes; later puts catch up
+
+    _stats_lock = threading.Lock()
+    _stats = {"hits": 0, "misses": 0, "tokens_saved": 0, "evicted": 0}
+
+    def __init__(self, deployment=None, max_entries=None):
+        self.deployment = deployment or Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT or 'default'
+        self.max_entries = max_entries or Config.EMBEDDING_CACHE_MAX_ENTRIES
+
+    @staticmethod
+    def normalize(content):
+        """Collapse whitespace so formatting-only edits still hit the cache"""
+        return re.sub(r'\s+', ' ', content).strip()
+
+    @classmethod
+    def text_hash(cls, content):
+        return hashlib.sha256(cls.normalize(content).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _parse_vector(value):
+        # pgvector comes back as its '[x,y,...]' text form without a registered adapter
+        if isinstance(value, str):
+            return json.loads(value)
+        return list(value)
+
+    def get_many(self, hashes):
+        """
+        Look up cached vectors and refresh their LRU timestamp
+
+        Returns:
+            dict: text_hash -> vector for every hash found
+        """
+        found = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+
+        with db.engine.begin() as conn:
+            for i in range(0, len(unique_hashes), self.QUERY_BATCH_SIZE):
+                batch = unique_hashes[i:i + self.QUERY_BATCH_SIZE]
+                rows = conn.execute(
+                    text("""
+                        UPDATE embedding_cache
+                        SET last_used_at = NOW()
+                        WHERE deployment = :dep AND text_hash = ANY(:hashes)
+                        RETURNING text_hash, embedding
+                    """),
+                    {"dep": self.deployment, "hashes": batch}
+                ).fetchall()
+                for row in rows:
+                    found[row.text_hash] = self._parse_vector(row.embedding)
+
+        return found
+
+    def put_many(self, hash_to_vector):
+        """Store new vectors (existing keys are left untouched) and enforce the size bound"""
+        items = list(hash_to_vector.items())
+
+        with db.engine.begin() as conn:
+            for i in range(0, len(items), self.QUERY_BATCH_SIZE):
+                batch = items[i:i + self.QUERY_BATCH_SIZE]
+                rows_sql = []
+                params = {"dep": self.deployment}
+                for n, (text_hash, vector) in enumerate(batch):
+                    rows_sql.append(f"(:dep, :hash_{n}, CAST(:embedding_{n} AS vector))")
+                    params[f"hash_{n}"] = text_hash
+                    params[f"embedding_{n}"] = PostgresVectorStore._vector_literal(vector)
+
+                conn.execute(
+                    text(f"""
+                        INSERT INTO embedding_cache (deployment, text_hash, embedding)
+                        VALUES {", ".join(rows_sql)}
+                        ON CONFLICT (deployment, text_hash) DO NOTHING
+                    """),
+                    params
+                )
+
+        self.evict()
+
+    def evict(self):
+        """
+        Drop least-recently-used rows beyond max_entries
+
+        Runs after every put, so it never counts the table: pg_class.reltuples
+        (kept current by autovacuum/ANALYZE) is read instead, and one call
+        deletes at most EVICT_BATCH_SIZE rows through the last_used_at index.
+        """
+        with db.engine.begin() as conn:
+            total = conn.execute(text("""
+                SELECT GREATEST(reltuples, 0)::bigint
+                FROM pg_class
+                WHERE oid = to_regclass('embedding_cache')
+            """)).scalar()
+            excess = min((total or 0) - self.max_entries, self.EVICT_BATCH_SIZE)
+            if excess <= 0:
+                return 0
+
+            result = conn.execute(
+                text("""
+                    DELETE FROM embedding_cache
+                    WHERE (deployment, text_hash) IN (
+                        SELECT deployment, text_hash
+                        FROM embedding_cache
+                        ORDER BY last_used_at
+                        LIMIT :excess
+                    )
+                """),
+                {"excess": excess}
+            )
+
+        self._record(evicted=result.rowcount)
+        print(f"🧹 Embedding cache evicted {result.rowcount} least-recently-used entries")
+        return result.rowcount
+
+    def embed_with_cache(self, texts, embed_fn):
+        """
+        Return one vector per text, calling embed_fn only for cache misses
+
+        Args:
+            texts: Chunk texts to embed
+            embed_fn: Callable(list[str]) -> list[vector] used for misses
+        """
+        hashes = [self.text_hash(t) for t in texts]
+        try:
+            cached = self.get_many(hashes)
+        except SQLAlchemyError as e:
+            # Cache problems must never block an upload: embed everything instead
+            print(f"⚠️ Embedding cache unavailable, embedding without cache: {e}")
+            cached = {}
+
+        # Embed each distinct missing text once
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in cached and h not in missing:
+                missing[h] = t
+
+        hits = sum(1 for h in hashes if h in cached)
+        tokens_saved = sum(len(t) // 4 + 1 for h, t in zip(hashes, texts) if h in cached)
+        self._record(hits=hits, misses=len(texts) - hits, tokens_saved=tokens_saved)
+        print(f"💾 Embedding cache: {hits} hits, {len(texts) - hits} misses "
+              f"({len(missing)} unique texts to embed)")
+
+        if missing:
+            new_vectors = embed_fn(list(missing.values()))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            cached.update(fresh)
+            try:
+                self.put_many(fresh)
+            except SQLAlchemyError as e:
+                # Vectors are already paid for - return them even if caching fails
+                print(f"⚠️ Could not write embedding cache: {e}")
+
+        return [cached[h] for h in hashes]
+
+    @classmethod
+    def _record(cls, **counts):
+        with cls._stats_lock:
+            for key, value in counts.items():
+                cls._stats[key] += value
+
+    @classmethod
+    def stats(cls):
+        """Process-wide counters since startup"""
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,162 @@
+"""
+Concurrent, rate-aware embedding executor
+
+Runs several embedding batches at once on a thread pool while staying inside
+the Azure OpenAI deployment's tokens-per-minute (TPM) and requests-per-minute
+(RPM) quota. A 429 from the service pauses every worker (honouring Retry-After
+when present) and the pause grows exponentially while 429s keep coming.
+
+The executor only needs an ``embed_fn(texts) -> vectors`` callable, so it can be
+pointed at AzureOpenAIEmbeddings.embed_documents or at any local stub server.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimitBudget:
+    """Sliding 60-second window of requests and tokens shared by all workers"""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, tokens_per_minute, requests_per_minute):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self._events and now - self._events[0][0] >= self.WINDOW_SECONDS:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def acquire(self, tokens):
+        """Block until the request fits in the budget, then reserve it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._purge(now)
+
+                fits_requests = len(self._events) < self.requests_per_minute
+                fits_tokens = self._tokens_in_window + tokens <= self.tokens_per_minute
+
+                # A single batch bigger than the whole TPM budget is let through
+                # on an empty window, otherwise it would wait forever
+                if (fits_requests and fits_tokens) or not self._events:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+
+                wait = self.WINDOW_SECONDS - (now - self._events[0][0])
+
+            time.sleep(max(wait, 0.01))
+
+
+class ConcurrentEmbeddingExecutor:
+    """Embed texts in parallel batches, returning vectors in input order"""
+
+    def __init__(self, embed_fn, batch_size=16, max_workers=4,
+                 tokens_per_minute=120000, requests_per_minute=720,
+                 max_retries=6, base_backoff=1.0, max_backoff=60.0):
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.budget = RateLimitBudget(tokens_per_minute, requests_per_minute)
+
+        self._pause_lock = threading.Lock()
+        self._paused_until = 0.0
+        self._consecutive_429s = 0
+
+        self.stats = {"batches": 0, "rate_limited": 0}
+
+    @staticmethod
+    def estimate_tokens(texts):
+        """Cheap token estimate (~4 characters per token) used for TPM budgeting"""
+        return sum(len(t) // 4 + 1 for t in texts)
+
+    @staticmethod
+    def _is_rate_limit_error(error):
+        status = getattr(error, 'status_code', None)
+        if status is None and getattr(error, 'response', None) is not None:
+            status = getattr(error.response, 'status_code', None)
+        return status == 429
+
+    @staticmethod
+    def _retry_after(error):
+        """Seconds from a Retry-After header, if the error carries one"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after') or headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def _wait_if_paused(self):
+        while True:
+            with self._pause_lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _register_rate_limit(self, error):
+        """Pause all workers; the pause doubles while 429s keep arriving"""
+        with self._pause_lock:
+            self._consecutive_429s += 1
+            self.stats["rate_limited"] += 1
+            delay = self._retry_after(error)
+            if delay is None:
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (self._consecutive_429s - 1)))
+                delay += random.uniform(0, delay * 0.25)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            print(f"⏳ Embedding rate limited (429), pausing workers for {delay:.1f}s")
+
+    def _embed_batch(self, index, texts):
+        tokens = self.estimate_tokens(texts)
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_if_paused()
+            self.budget.acquire(tokens)
+            try:
+                vectors = self.embed_fn(texts)
+                with self._pause_lock:
+                    self._consecutive_429s = 0
+                    self.stats["batches"] += 1
+                return index, vectors
+            except Exception as e:
+                if not self._is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self._register_rate_limit(e)
+
+    def embed(self, texts):
+        """
+        Embed all texts concurrently
+
+        Returns:
+            list: One vector per input text, in the same order as texts
+        """
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = [None] * len(batches)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            futures = [pool.submit(self._embed_batch, i, batch) for i, batch in enumerate(batches)]
+            for future in futures:
+                index, vectors = future.result()
+                results[index] = vectors
+
+        elapsed = time.perf_counter() - start
+        print(f"🔢 Embedded {len(texts)} texts in {len(batches)} batches "
+              f"({self.max_workers} workers) in {elapsed:.2f}s")
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
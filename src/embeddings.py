@@ -1,23 +1,43 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import AzureOpenAIEmbeddings
 from config import Config
+from src.embedding_executor import ConcurrentEmbeddingExecutor
+from src.embedding_cache import EmbeddingCache
+from src.llm_clients import get_embeddings
+
+CHUNK_SIZE = 800       # Reduced from 1000 for faster processing
+CHUNK_OVERLAP = 100    # Reduced from 200
 
 class EmbeddingPipeline:
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,      # Reduced from 1000 for faster processing
-            chunk_overlap=100    # Reduced from 200
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP
         )
-        self.embeddings = AzureOpenAIEmbeddings(
-            azure_deployment=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_API_KEY,
-            api_version=Config.AZURE_OPENAI_API_VERSION,
-            chunk_size=16  # Process embeddings in batches of 16
+        self.embeddings = get_embeddings(chunk_size=16)  # Shared client, batches of 16
+        # Run several batches of 16 at once within the deployment's TPM/RPM quota
+        self.executor = ConcurrentEmbeddingExecutor(
+            self.embeddings.embed_documents,
+            batch_size=16,
+            max_workers=Config.EMBEDDING_MAX_WORKERS,
+            tokens_per_minute=Config.EMBEDDING_TOKENS_PER_MINUTE,
+            requests_per_minute=Config.EMBEDDING_REQUESTS_PER_MINUTE
         )
+        # Unchanged chunks are served from the embedding_cache table instead of Azure
+        self.cache = EmbeddingCache() if use_cache and Config.EMBEDDING_CACHE_ENABLED else None
+    
+    def split(self, documents):
+        return self.splitter.split_documents(documents)
     
     def process(self, documents):
-        chunks = self.splitter.split_documents(documents)
+        chunks = self.split(documents)
         texts = [c.page_content for c in chunks]
-        vectors = self.embeddings.embed_documents(texts)
-        return chunks, vectors
\ No newline at end of file
+        vectors = self.embed_texts(texts)
+        return chunks, vectors
+    
+    def embed_texts(self, texts):
+        """Embed texts, reusing cached vectors for chunks seen before"""
+        if self.cache is None:
+            return self.executor.embed(texts)
+        
+        # Cache DB errors are handled inside; embedding (Azure) errors propagate
+        return self.cache.embed_with_cache(texts, self.executor.embed)
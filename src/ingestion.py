@@ -0,0 +1,55 @@
+"""
+Parallel parsing for uploads
+
+PDF/DOCX parsing and splitting is CPU-bound, so the files saved by one upload
+are parsed in a process pool (spawned, not forked, so workers never inherit
+the web process's DB connections or threads). Results are yielded as each file
+finishes, letting the caller embed and store one file while others are still
+being parsed.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import Config
+from src.data_loader import split_file
+from src.embeddings import CHUNK_SIZE, CHUNK_OVERLAP
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.INGEST_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def iter_split_files(file_paths):
+    """
+    Parse and split files, yielding (file_path, chunks, page_count) as each completes
+
+    A single file (or INGEST_PARSE_WORKERS=0) is parsed in-process, which
+    avoids pickling its chunks back from a worker.
+    """
+    if Config.INGEST_PARSE_WORKERS <= 0 or len(file_paths) <= 1:
+        for path in file_paths:
+            chunks, pages = split_file(path, CHUNK_SIZE, CHUNK_OVERLAP)
+            yield path, chunks, pages
+        return
+
+    pool = _get_pool()
+    futures = {pool.submit(split_file, path, CHUNK_SIZE, CHUNK_OVERLAP): path for path in file_paths}
+    try:
+        for future in as_completed(futures):
+            chunks, pages = future.result()
+            yield futures[future], chunks, pages
+    finally:
+        # Caller stopped early (e.g. an error storing a file): drop queued parses
+        for future in futures:
+            future.cancel()
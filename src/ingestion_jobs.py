@@ -0,0 +1,364 @@
+"""
+Background ingestion jobs
+
+/upload only validates, de-duplicates and saves files, then records an
+IngestionJob and returns its id. Worker threads (in every app process) claim
+queued jobs with FOR UPDATE SKIP LOCKED, so each job runs exactly once, and
+parse / embed / store the files, reporting progress on the job row.
+
+Crash recovery: a running job's heartbeat is refreshed every few seconds. If a
+process dies, its jobs stop heartbeating and are re-queued by any live worker.
+Files already marked done are skipped on resume; a file interrupted half-way
+was never committed (one transaction per file), and if it was committed but
+not yet marked done, incremental re-indexing finds every chunk unchanged
+(resumed jobs always re-index, even with INCREMENTAL_REINDEX_ENABLED off).
+
+Workers start lazily, on the first request a process serves (see
+ensure_ingestion_workers), so they only ever run in processes that serve
+traffic: never in spawned parse processes, CLI commands such as
+`flask db upgrade`, or a `gunicorn --preload` master before it forks.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import flag_modified
+from config import Config
+from extensions import db
+from models import IngestionJob, User, AdminActivityLog
+from src.chatbot_registry import chatbot_registry
+from src.embeddings import EmbeddingPipeline
+from src.ingestion import iter_split_files
+from src.pg_vectorstore import PostgresVectorStore
+from src.partitions import ensure_department_partition
+
+
+class NoDocumentsError(ValueError):
+    """None of a job's files produced any chunks"""
+
+
+def create_job(user, department, access_level, is_cross_dept, saved_files, file_hashes, skipped_files):
+    """Record a queued job for files already saved under uploads/<department>"""
+    job = IngestionJob(
+        created_by=user.id,
+        department=department,
+        access_level=access_level,
+        is_cross_dept=is_cross_dept,
+        status='queued',
+        stage='queued',
+        files=[{'filename': name, 'file_hash': file_hashes[name], 'status': 'pending'}
+               for name in saved_files],
+        skipped_files=skipped_files,
+        chunks_total=0,
+        chunks_done=0,
+        vectors_stored=0,
+        attempts=0
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _save_progress(job, stage=None):
+    """Recompute totals from the per-file entries and commit"""
+    if stage:
+        job.stage = stage
+    files = job.files or []
+    job.chunks_total = sum(f.get('chunks', 0) for f in files)
+    job.chunks_done = sum(f.get('chunks', 0) for f in files if f.get('status') == 'done')
+    job.vectors_stored = sum(f.get('vectors', 0) for f in files if f.get('status') == 'done')
+    job.heartbeat_at = datetime.utcnow()
+    flag_modified(job, 'files')
+    db.session.commit()
+
+
+def run_job(job_id):
+    """Parse, embed and store every pending file of a job (called with the job claimed)"""
+    job = db.session.get(IngestionJob, job_id)
+    user = db.session.get(User, job.created_by)
+    upload_path = os.path.join("uploads", job.department)
+    store = PostgresVectorStore(job.department, user)
+    embedding_pipeline = EmbeddingPipeline()
+    
+    entries = {f['filename']: f for f in job.files}
+    pending = [name for name, f in entries.items() if f.get('status') != 'done']
+    print(f"🏗️ Ingestion job #{job.id}: {len(pending)} of {len(entries)} file(s) to process "
+          f"(attempt {job.attempts})")
+    _save_progress(job, stage='parsing')
+    
+    # Before any upload transaction: creating a partition locks document_embeddings
+    if not job.is_cross_dept:
+        ensure_department_partition(job.department)
+    
+    paths = [os.path.join(upload_path, name) for name in pending]
+    for file_path, chunks, page_count in iter_split_files(paths):
+        entry = entries[os.path.basename(file_path)]
+        entry.update(pages=page_count, chunks=len(chunks))
+        if not chunks:
+            print(f"⚠️ No content loaded from {entry['filename']}")
+            entry.update(status='done', vectors=0)
+            _save_progress(job)
+            continue
+        
+        print(f"✂️ {entry['filename']}: {page_count} pages, {len(chunks)} chunks")
+        _save_progress(job, stage='embedding')
+        file_start = time.perf_counter()
+        
+        file_args = dict(
+            access_level=job.access_level,
+            is_cross_dept=job.is_cross_dept,
+            uploaded_by=job.created_by,
+            file_type=entry['filename'].rsplit('.', 1)[-1],
+            file_hash=entry['file_hash'],  # ✅ BUG #11 FIX: Pass file hash
+            page_count=page_count
+        )
+        
+        reindex = None
+        # A resumed job may have committed this file before the crash; re-indexing
+        # keeps the stored chunks instead of inserting them a second time
+        if Config.INCREMENTAL_REINDEX_ENABLED or job.attempts > 1:
+            reindex = store.reindex_file(entry['filename'], chunks, embedding_pipeline.embed_texts, **file_args)
+        
+        if reindex is not None:
+            entry.update(reindex=reindex, vectors=reindex['inserted'], document_id=reindex['document_id'])
+        else:
+            vectors = embedding_pipeline.embed_texts([c.page_content for c in chunks])
+            _save_progress(job, stage='storing')
+            entry['vectors'] = store.build(
+                vectors,
+                chunks,
+                source_type='primary',
+                file_name=entry['filename'],
+                **file_args
+            )
+            entry['document_id'] = store.last_build_stats['document_id']
+        
+        entry.update(status='done', seconds=round(time.perf_counter() - file_start, 2))
+        _save_progress(job)
+    
+    if job.chunks_total == 0:
+        raise NoDocumentsError("No valid documents found")
+    
+    # ✅ BUG #10 FIX: Analyze table after bulk insert
+    _save_progress(job, stage='analyzing')
+    try:
+        db.session.execute(text("ANALYZE document_embeddings"))
+        print("✅ Table statistics updated (ANALYZE)")
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ ANALYZE failed (non-critical): {e}")
+    
+    saved_files = [f['filename'] for f in job.files]
+    skipped_files = job.skipped_files or []
+    db.session.add(AdminActivityLog(
+        admin_id=job.created_by,
+        action_type='upload',
+        target_type='document',
+        description=f"Uploaded {len(saved_files)} file(s) to {job.department} department" + 
+                   (f" ({len(skipped_files)} duplicate(s) skipped)" if skipped_files else ""),
+        meta_data={
+            'job_id': job.id,
+            'files_uploaded': saved_files,
+            'files_skipped': len(skipped_files),
+            'skipped_details': skipped_files,
+            'chunks_created': job.chunks_total,
+            'vectors_stored': job.vectors_stored,
+            'reindexed_files': [f for f in job.files if 'reindex' in f],
+            'access_level': job.access_level,
+            'is_cross_dept': job.is_cross_dept,
+            'file_hashes': {f['filename']: f['file_hash'] for f in job.files}
+        }
+    ))
+    job.status = 'completed'
+    job.finished_at = datetime.utcnow()
+    _save_progress(job, stage='done')
+    
+    # Clear the uploader's chatbot instances to force reload
+    chatbot_registry.discard_prefix(f"{job.created_by}_")
+    print(f"✅ Ingestion job #{job.id} complete: {job.chunks_total} chunks, {job.vectors_stored} vectors")
+
+
+def run_job_inline(job_id, heartbeat_interval):
+    """
+    Run a job inside the current (web) request, claimed and heartbeating like a worker job
+
+    Without the heartbeat, worker threads in other processes would consider the
+    job stale after INGEST_JOB_STALE_SECONDS and run it a second time.
+    """
+    now = datetime.utcnow()
+    job = db.session.get(IngestionJob, job_id)
+    job.status = 'running'
+    job.attempts = (job.attempts or 0) + 1
+    job.started_at = job.started_at or now
+    job.heartbeat_at = now
+    db.session.commit()
+    
+    with _Heartbeat(db.engine, job_id, interval=heartbeat_interval):
+        try:
+            run_job(job_id)
+        except Exception as e:
+            fail_job(job_id, e)
+            raise
+
+
+def fail_job(job_id, error):
+    db.session.rollback()
+    job = db.session.get(IngestionJob, job_id)
+    job.status = 'failed'
+    job.error = str(error)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+class _Heartbeat:
+    """Refreshes a running job's heartbeat_at on its own connection while the job works"""
+
+    def __init__(self, engine, job_id, interval):
+        self.engine = engine
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"ingest-heartbeat-{job_id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        text("UPDATE ingestion_job SET heartbeat_at = :now WHERE id = :id"),
+                        {"now": datetime.utcnow(), "id": self.job_id}
+                    )
+            except Exception as e:
+                print(f"⚠️ Ingestion heartbeat failed for job #{self.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class IngestionWorkerPool:
+    """Threads that claim and run queued ingestion jobs for this process"""
+
+    def __init__(self, app, workers=2, poll_seconds=5, stale_seconds=120, max_attempts=3):
+        self.app = app
+        self.pid = os.getpid()
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"ingest-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🏗️ Started {self.workers} ingestion worker thread(s)")
+
+    def notify(self):
+        """Wake idle workers after a job is queued"""
+        self._wake.set()
+
+    def claim_next_job(self):
+        now = datetime.utcnow()
+        job_id = db.session.execute(text("""
+            UPDATE ingestion_job
+            SET status = 'running', attempts = COALESCE(attempts, 0) + 1,
+                heartbeat_at = :now, started_at = COALESCE(started_at, :now), error = NULL
+            WHERE id = (
+                SELECT id FROM ingestion_job
+                WHERE status = 'queued'
+                ORDER BY id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id
+        """), {"now": now}).scalar()
+        db.session.commit()
+        return job_id
+
+    def recover_stale_jobs(self):
+        """Re-queue running jobs whose worker stopped heartbeating (or fail them after max_attempts)"""
+        now = datetime.utcnow()
+        rows = db.session.execute(text("""
+            UPDATE ingestion_job
+            SET status = CASE WHEN attempts >= :max THEN 'failed' ELSE 'queued' END,
+                error = CASE WHEN attempts >= :max
+                             THEN 'Worker stopped responding after ' || attempts || ' attempt(s)'
+                             ELSE error END,
+                finished_at = CASE WHEN attempts >= :max THEN :now ELSE finished_at END
+            WHERE status = 'running' AND heartbeat_at < :cutoff
+            RETURNING id, status
+        """), {"max": self.max_attempts, "now": now,
+               "cutoff": now - timedelta(seconds=self.stale_seconds)}).fetchall()
+        db.session.commit()
+        for row in rows:
+            print(f"♻️ Ingestion job #{row.id} lost its worker - now {row.status}")
+        return len(rows)
+
+    def _loop(self):
+        while True:
+            job_id = None
+            try:
+                with self.app.app_context():
+                    self.recover_stale_jobs()
+                    job_id = self.claim_next_job()
+                    if job_id:
+                        self._run(job_id)
+            except Exception as e:
+                print(f"⚠️ Ingestion worker error: {e}")
+            
+            if not job_id:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def _run(self, job_id):
+        with _Heartbeat(db.engine, job_id, interval=heartbeat_interval()):
+            try:
+                run_job(job_id)
+            except Exception as e:
+                print(f"❌ Ingestion job #{job_id} failed: {e}")
+                import traceback
+                traceback.print_exc()
+                fail_job(job_id, e)
+
+
+ingestion_workers = None
+_workers_lock = threading.Lock()
+
+
+def heartbeat_interval():
+    return max(Config.INGEST_JOB_STALE_SECONDS // 4, 1)
+
+
+def ensure_ingestion_workers(app):
+    """
+    Start this process's worker threads on first use (None when INGEST_JOB_WORKERS is 0)
+
+    Called per request, so the pool is created after any fork; a pool inherited
+    from a parent process (whose threads did not survive the fork) is replaced.
+    """
+    global ingestion_workers
+    if Config.INGEST_JOB_WORKERS <= 0:
+        return None
+    if ingestion_workers is not None and ingestion_workers.pid == os.getpid():
+        return ingestion_workers
+    
+    with _workers_lock:
+        if ingestion_workers is None or ingestion_workers.pid != os.getpid():
+            ingestion_workers = IngestionWorkerPool(
+                app,
+                workers=Config.INGEST_JOB_WORKERS,
+                poll_seconds=Config.INGEST_JOB_POLL_SECONDS,
+                stale_seconds=Config.INGEST_JOB_STALE_SECONDS,
+                max_attempts=Config.INGEST_JOB_MAX_ATTEMPTS
+            )
+            ingestion_workers.start()
+    return ingestion_workers
@@ -0,0 +1,139 @@
+"""
+Process-wide Azure OpenAI clients
+
+Every chat session, upload and feedback approval used to build its own
+AzureChatOpenAI / AzureOpenAIEmbeddings, each with a fresh HTTP connection
+pool, so the first request paid a TCP + TLS handshake. The factory below hands
+out shared clients that all ride on one keep-alive httpx pool per process.
+
+Clients are rebuilt after a fork (gunicorn --preload), because sockets must
+not be shared between worker processes.
+"""
+
+import os
+import threading
+import httpx
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from config import Config
+
+_lock = threading.Lock()
+_pid = None
+_http_client = None
+_clients = {}
+_warmed_up_pid = None
+
+
+def _reset_after_fork():
+    """Drop clients inherited from a parent process; call with _lock held"""
+    global _pid, _http_client
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _http_client = None
+        _clients.clear()
+
+
+def get_http_client():
+    """Shared keep-alive httpx pool used by every Azure OpenAI client"""
+    global _http_client
+    with _lock:
+        _reset_after_fork()
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=Config.AZURE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.AZURE_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=Config.AZURE_HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(Config.AZURE_HTTP_TIMEOUT, connect=10.0)
+            )
+        return _http_client
+
+
+def _get_or_create(key, factory):
+    http_client = get_http_client()
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory(http_client)
+            _clients[key] = client
+        return client
+
+
+def get_chat_llm():
+    """Shared chat model (temperature 0.1, 800 max tokens)"""
+    return _get_or_create('chat', lambda http_client: AzureChatOpenAI(
+        azure_deployment=Config.AZURE_OPENAI_CHAT_DEPLOYMENT,
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_API_KEY,
+        api_version=Config.AZURE_OPENAI_API_VERSION,
+        temperature=0.1,
+        max_tokens=800,
+        timeout=30,
+        http_client=http_client
+    ))
+
+
+def get_embeddings(chunk_size=None):
+    """
+    Shared embeddings client
+
+    Args:
+        chunk_size: Texts per embedding request for embed_documents
+                    (None keeps the library default)
+    """
+    def factory(http_client):
+        kwargs = {'chunk_size': chunk_size} if chunk_size else {}
+        return AzureOpenAIEmbeddings(
+            azure_deployment=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+            api_key=Config.AZURE_OPENAI_API_KEY,
+            api_version=Config.AZURE_OPENAI_API_VERSION,
+            http_client=http_client,
+            **kwargs
+        )
+    return _get_or_create(('embeddings', chunk_size), factory)
+
+
+def warm_up():
+    """
+    Open pooled connections to the Azure endpoint ahead of the first user request
+
+    Any HTTP response (even 404) means TCP + TLS are established and the
+    connection sits in the keep-alive pool. Failures are logged, never raised.
+    """
+    if not Config.AZURE_OPENAI_ENDPOINT:
+        return False
+    try:
+        get_chat_llm()
+        get_embeddings()
+        get_http_client().head(Config.AZURE_OPENAI_ENDPOINT)
+        print("🔥 Azure OpenAI connection pool warmed up")
+        return True
+    except Exception as e:
+        print(f"⚠️ Azure OpenAI warm-up failed (clients will connect lazily): {e}")
+        return False
+
+
+def warm_up_in_background():
+    """Run warm_up() without delaying application start-up"""
+    thread = threading.Thread(target=warm_up, name="azure-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def ensure_warm_up():
+    """
+    Start warm_up_in_background() once per serving process
+
+    Called from the first request a process handles (like the ingestion workers),
+    never at import time, so spawned parse processes, CLI commands and a
+    `gunicorn --preload` master do not open Azure connections of their own.
+    """
+    global _warmed_up_pid
+    if _warmed_up_pid == os.getpid():
+        return None
+    with _lock:
+        if _warmed_up_pid == os.getpid():
+            return None
+        _warmed_up_pid = os.getpid()
+    return warm_up_in_background()
@@ -0,0 +1,137 @@
+"""
+Partition management for document_embeddings
+
+Layout (see migration d7a3f0c9e218):
+
+    document_embeddings                   PARTITION BY LIST (source_type)
+    ├── document_embeddings_primary       PARTITION BY LIST (dept_partition)
+    │   ├── document_embeddings_cross_dept    FOR VALUES IN ('_cross_dept')
+    │   ├── document_embeddings_p_<dept>_<h>  one per department
+    │   └── document_embeddings_primary_default
+    └── document_embeddings_secondary
+
+dept_partition is '_cross_dept' for is_cross_dept rows and the department name
+otherwise, so the retrieval filter `dept_partition IN (:dept, '_cross_dept')`
+prunes to two partitions, each with its own ANN and full-text indexes.
+"""
+
+import hashlib
+import re
+from extensions import db
+from sqlalchemy import text
+
+CROSS_DEPT_PARTITION = '_cross_dept'
+PRIMARY_PARENT = 'document_embeddings_primary'
+PARTITION_LOCK_TIMEOUT = '5s'
+
+
+def dept_partition_value(department, is_cross_dept):
+    """Partition key stored in document_embeddings.dept_partition"""
+    return CROSS_DEPT_PARTITION if is_cross_dept else department
+
+
+def department_partition_name(department):
+    """Stable, identifier-safe table name for a department's primary partition"""
+    slug = re.sub(r'[^a-z0-9_]', '_', department.lower())[:30]
+    digest = hashlib.md5(department.encode('utf-8')).hexdigest()[:8]
+    return f"document_embeddings_p_{slug}_{digest}"
+
+
+def _quote_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def ensure_department_partition(department):
+    """
+    Create the department's primary partition if it does not exist yet
+
+    Runs in its own short transaction on a separate connection, never inside an
+    upload's transaction: CREATE TABLE ... PARTITION OF takes an ACCESS EXCLUSIVE
+    lock on the partitioned parent, which would otherwise be held (blocking all
+    retrieval) for the whole embed-and-insert. Call it before the ingest starts.
+    A lock_timeout bounds the wait; on any failure (e.g. rows for this department
+    already sitting in the default partition) rows keep landing in the default
+    partition.
+    """
+    if department == CROSS_DEPT_PARTITION:
+        return
+
+    name = department_partition_name(department)
+    try:
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+            ).scalar()
+            if exists:
+                return
+            conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PRIMARY_PARENT} "
+                f"FOR VALUES IN ({_quote_literal(department)})"
+            ))
+        print(f"🧱 Created partition {name} for department: {department}")
+    except Exception as e:
+        print(f"⚠️ Could not create partition for {department}, using default partition: {e}")
+
+
+def detach_department_partition(department):
+    """
+    Detach the department's primary partition ahead of deleting its data
+
+    Like ensure_department_partition this runs in its own short transaction with
+    a lock_timeout: DETACH PARTITION takes an ACCESS EXCLUSIVE lock on the
+    primary parent, which must not be held for a whole request. (DETACH ...
+    CONCURRENTLY is refused because the primary parent has a default partition.)
+    The detached table keeps its foreign key to documents; that is dropped too,
+    so deleting the department's catalog rows does not cascade into it. Drop the
+    table itself with drop_detached_partition() once the data transaction commits.
+
+    Returns:
+        tuple: (table name or None, rows in it). (None, 0) if the department has no
+               partition or it could not be detached - its rows are then left for a
+               regular DELETE.
+    """
+    name = department_partition_name(department)
+    try:
+        with db.engine.begin() as conn:
+            parent = conn.execute(
+                text("""
+                    SELECT i.inhparent::regclass::text
+                    FROM pg_inherits i
+                    WHERE i.inhrelid = to_regclass(:name)
+                """),
+                {"name": name}
+            ).scalar()
+            exists = parent is not None or conn.execute(
+                text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+            ).scalar()
+            if not exists:
+                return None, 0
+
+            row_count = conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+            if parent is not None:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                conn.execute(text(f"ALTER TABLE {PRIMARY_PARENT} DETACH PARTITION {name}"))
+            foreign_keys = conn.execute(
+                text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'f'"),
+                {"name": name}
+            ).scalars().all()
+            for constraint in foreign_keys:
+                conn.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"'))
+        return name, row_count
+    except Exception as e:
+        print(f"⚠️ Could not detach partition for {department}, deleting its rows instead: {e}")
+        return None, 0
+
+
+def drop_detached_partition(name):
+    """Drop a table detached by detach_department_partition() (its own short transaction)"""
+    if not name:
+        return
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    except Exception as e:
+        # Harmless leftover: no longer part of document_embeddings, retried on the next delete
+        print(f"⚠️ Could not drop detached partition {name}: {e}")
@@ -4,82 +4,163 @@ import numpy as np
 from langchain.schema import Document
 from typing import List
 import json
+import hashlib
 import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from src.query_cache import answer_cache
+from src.vector_index import apply_search_settings
+from src.partitions import (dept_partition_value, ensure_department_partition,
+                            detach_department_partition, drop_detached_partition)
+from src.corpus_metadata import corpus_metadata
+from src.document_catalog import upsert_document
+
+# Shared by all requests; each task checks out its own pooled DB connection
+# keyword_score: fraction of the query's keywords whose stemmed form occurs in the chunk,
+# the same 0..1 scale the ILIKE matcher had (and that hybrid_alpha / MIN_SIMILARITY assume).
+# Keywords that are full-text stopwords produce an empty tsquery and are not counted.
+KEYWORD_SCORE_SQL = """
+    (SELECT COUNT(*) FILTER (WHERE content_tsv @@ term_query)::float / NULLIF(COUNT(*), 0)
+     FROM unnest(CAST(:kw_terms AS text[])) AS kw(term)
+     CROSS JOIN LATERAL plainto_tsquery('english', kw.term) AS term_query
+     WHERE numnode(term_query) > 0)
+"""
+
+_retrieval_pool = ThreadPoolExecutor(
+    max_workers=Config.RETRIEVAL_PARALLEL_WORKERS,
+    thread_name_prefix="retrieval"
+)
+
+def on_department_data_changed(department, affects_all_departments=False, corpus_changed=True):
+    """
+    Invalidate in-process caches after chunks are added or removed
+    
+    Cross-department and Secondary KB chunks are visible to every department,
+    so changes to them invalidate everything. corpus_changed=False leaves the
+    corpus metadata alone (build() updates it in place instead).
+    """
+    answer_cache.invalidate_department(None if affects_all_departments else department)
+    if corpus_changed:
+        corpus_metadata.invalidate(department, include_cross_dept=affects_all_departments)
+
 
 class PostgresVectorStore:
     def __init__(self, department, user=None):
         self.department = department
         self.user = user
+        self.last_build_stats = None
+        self._search_settings = {}
     
     def build(self, vectors, documents, access_level='public', is_cross_dept=False, 
               source_type='primary', uploaded_by=None, file_name=None, file_type=None,
-              feedback_id=None, file_hash=None):  # ✅ BUG #5 & #11 FIX
-        """Store vectors and documents in PostgreSQL"""
+              feedback_id=None, file_hash=None, batch_size=None, row_level_errors=False,
+              page_count=None, document_id=None, ensure_partition=True):  # ✅ BUG #5 & #11 FIX
+        """
+        Store vectors and documents in PostgreSQL
+        
+        Rows are written as multi-row INSERT ... VALUES batches inside a single
+        transaction, so a large upload costs len(vectors) / batch_size round trips
+        instead of one per chunk.
+        
+        When file_name is given the chunks are attached to that file's row in the
+        documents catalog (created or updated in the same transaction).
+        
+        Args:
+            batch_size: Rows per INSERT statement (defaults to Config.VECTOR_INSERT_BATCH_SIZE)
+            row_level_errors: Slow path - insert row by row inside savepoints and skip
+                              (and report) individual failing chunks
+            page_count: Pages parsed from the file, recorded in the catalog
+            document_id: Existing catalog row to attach to (looked up from file_name if omitted)
+            ensure_partition: False when the caller already ensured the department
+                              partition before its own writes (see reindex_file)
+        
+        Returns:
+            int: Number of rows inserted. Per-batch timings are kept in self.last_build_stats
+        """
         try:
             # Convert vectors to numpy array if needed
             if isinstance(vectors, list):
                 vectors = np.array(vectors, dtype='float32')
             
+            batch_size = batch_size or Config.VECTOR_INSERT_BATCH_SIZE
+            
             print(f"📤 Uploading {len(vectors)} vectors for department: {self.department}")
             
-            # Insert documents in batches
-            batch_size = 50
+            # Department rows get their own primary partition (with its own ANN index).
+            # Usually a no-op: ingestion jobs create it up front in its own short
+            # transaction. Its lock_timeout keeps a caller that already holds locks
+            # from waiting on itself (rows then go to the default partition).
+            if ensure_partition and source_type == 'primary' and not is_cross_dept:
+                ensure_department_partition(self.department)
+            
+            if document_id is None and file_name:
+                document_id = upsert_document(
+                    self.department, file_name,
+                    source_type=source_type,
+                    access_level=access_level,
+                    is_cross_dept=is_cross_dept,
+                    file_type=file_type,
+                    file_hash=file_hash,
+                    uploaded_by=uploaded_by,
+                    feedback_id=feedback_id,
+                    page_count=page_count
+                )
+            
+            shared = {
+                "dept": self.department,
+                "dept_part": dept_partition_value(self.department, is_cross_dept),
+                "access": access_level,
+                "cross": is_cross_dept,
+                "source": source_type,
+                "uploader": uploaded_by,
+                "fname": file_name,
+                "ftype": file_type,
+                "fid": feedback_id,
+                "fhash": file_hash,
+                "doc_id": document_id
+            }
+            
             total_inserted = 0
+            batch_timings = []
+            build_start = time.perf_counter()
             
             for i in range(0, len(vectors), batch_size):
                 batch_vectors = vectors[i:i+batch_size]
                 batch_docs = documents[i:i+batch_size]
+                batch_start = time.perf_counter()
                 
-                for vector, doc in zip(batch_vectors, batch_docs):
-                    try:
-                        vector_list = vector.tolist() if isinstance(vector, np.ndarray) else vector
-                        metadata_json = json.dumps(doc.metadata) if doc.metadata else '{}'
-                        
-                        db.session.execute(
-                            text("""
-                                INSERT INTO document_embeddings 
-                                (department, content, metadata, embedding, access_level, 
-                                 is_cross_dept, source_type, uploaded_by, file_name, file_type, feedback_id, file_hash)
-                                VALUES (
-                                    :dept,
-                                    :content,
-                                    CAST(:metadata AS jsonb),
-                                    CAST(:embedding AS vector),
-                                    :access,
-                                    :cross,
-                                    :source,
-                                    :uploader,
-                                    :fname,
-                                    :ftype,
-                                    :fid,
-                                    :fhash
-                                )
-                            """),
-                            {
-                                "dept": self.department,
-                                "content": doc.page_content,
-                                "metadata": metadata_json,
-                                "embedding": str(vector_list),
-                                "access": access_level,
-                                "cross": is_cross_dept,
-                                "source": source_type,
-                                "uploader": uploaded_by,
-                                "fname": file_name,
-                                "ftype": file_type,
-                                "fid": feedback_id,
-                                "fhash": file_hash
-                            }
-                        )
-                        total_inserted += 1
-                        
-                    except Exception as e:
-                        print(f"⚠️ Error inserting vector {total_inserted + 1}: {str(e)}")
-                        continue
+                if row_level_errors:
+                    inserted = self._insert_rows_individually(batch_vectors, batch_docs, shared, total_inserted)
+                else:
+                    inserted = self._insert_batch(batch_vectors, batch_docs, shared)
                 
-                db.session.commit()
-                print(f"  ✅ Inserted batch: {total_inserted}/{len(vectors)} vectors")
+                total_inserted += inserted
+                elapsed = time.perf_counter() - batch_start
+                batch_timings.append({"rows": inserted, "seconds": round(elapsed, 4)})
+                print(f"  ✅ Inserted batch: {total_inserted}/{len(vectors)} vectors ({elapsed * 1000:.0f} ms)")
             
-            print(f"✅ Successfully stored {total_inserted} vectors")
+            # ✅ One commit for the whole upload instead of one per batch
+            db.session.commit()
+            on_department_data_changed(
+                self.department,
+                affects_all_departments=is_cross_dept or source_type == 'secondary',
+                corpus_changed=False
+            )
+            if source_type == 'primary':
+                corpus_metadata.record_added(dept_partition_value(self.department, is_cross_dept), total_inserted)
+            
+            total_elapsed = time.perf_counter() - build_start
+            self.last_build_stats = {
+                "rows": total_inserted,
+                "document_id": document_id,
+                "batches": batch_timings,
+                "seconds": round(total_elapsed, 4)
+            }
+            
+            print(f"✅ Successfully stored {total_inserted} vectors in {total_elapsed:.2f}s "
+                  f"({len(batch_timings)} batches)")
             return total_inserted
             
         except Exception as e:
@@ -89,13 +170,194 @@ class PostgresVectorStore:
             traceback.print_exc()
             raise
     
-    def search(self, query_vector, k=5, similarity_threshold=0.7, query_text=None, hybrid_alpha=0.7):
+    @staticmethod
+    def chunk_hash(content):
+        """Same value as the generated document_embeddings.chunk_hash column"""
+        return hashlib.md5((content or '').encode('utf-8')).hexdigest()
+    
+    def reindex_file(self, file_name, chunks, embed_texts, access_level='public', is_cross_dept=False,
+                     uploaded_by=None, file_type=None, file_hash=None, page_count=None):
+        """
+        Incrementally replace a previously uploaded file with a new version
+        
+        Stored chunks whose chunk_hash matches a new chunk are kept as-is; only
+        new or changed chunks are embedded and inserted, and chunks no longer in
+        the file are deleted, all in one transaction.
+        
+        Args:
+            file_name: Sanitized file name (matched with the department)
+            chunks: Split Documents of the new version
+            embed_texts: Callable embedding a list of texts (EmbeddingPipeline.embed_texts)
+        
+        Returns:
+            dict: kept / inserted / deleted counts and the catalog document_id,
+                  or None if the file was never uploaded
+        """
+        # Before any statement of this transaction: the separate connection creating
+        # the partition would otherwise wait on locks this transaction already holds
+        if not is_cross_dept:
+            ensure_department_partition(self.department)
+        
+        existing = db.session.execute(
+            text("""
+                SELECT id, chunk_hash, access_level, is_cross_dept
+                FROM document_embeddings
+                WHERE source_type = 'primary'
+                  AND department = :dept
+                  AND file_name = :fname
+            """),
+            {"dept": self.department, "fname": file_name}
+        ).fetchall()
+        
+        if not existing:
+            return None
+        
+        # A change of access level or cross-dept flag re-stores every chunk
+        available = defaultdict(list)
+        if all(r.access_level == access_level and r.is_cross_dept == is_cross_dept for r in existing):
+            for r in existing:
+                available[r.chunk_hash].append(r.id)
+        
+        keep_ids, new_chunks = [], []
+        for chunk in chunks:
+            ids = available.get(self.chunk_hash(chunk.page_content))
+            if ids:
+                keep_ids.append(ids.pop())
+            else:
+                new_chunks.append(chunk)
+        
+        kept = set(keep_ids)
+        delete_ids = [r.id for r in existing if r.id not in kept]
+        print(f"♻️ Re-indexing {file_name}: {len(keep_ids)} unchanged, "
+              f"{len(new_chunks)} new/changed, {len(delete_ids)} removed chunks")
+        
+        # Embed before writing anything: a failed embedding call leaves the stored
+        # version untouched, and the writes below form one short transaction
+        vectors = embed_texts([c.page_content for c in new_chunks]) if new_chunks else []
+        
+        try:
+            document_id = upsert_document(
+                self.department, file_name,
+                source_type='primary',
+                access_level=access_level,
+                is_cross_dept=is_cross_dept,
+                file_type=file_type,
+                file_hash=file_hash,
+                uploaded_by=uploaded_by,
+                page_count=page_count
+            )
+            if delete_ids:
+                db.session.execute(
+                    text("DELETE FROM document_embeddings WHERE source_type = 'primary' AND id = ANY(:ids)"),
+                    {"ids": delete_ids}
+                )
+            if keep_ids:
+                # Kept chunks now belong to the new version of the file
+                db.session.execute(
+                    text("UPDATE document_embeddings SET file_hash = COALESCE(:fhash, file_hash), document_id = :doc_id "
+                         "WHERE source_type = 'primary' AND id = ANY(:ids)"),
+                    {"fhash": file_hash, "doc_id": document_id, "ids": keep_ids}
+                )
+            
+            inserted = 0
+            if new_chunks:
+                # build() commits the upsert, deletes and updates together with the inserts
+                inserted = self.build(
+                    vectors, new_chunks,
+                    access_level=access_level,
+                    is_cross_dept=is_cross_dept,
+                    source_type='primary',
+                    uploaded_by=uploaded_by,
+                    file_name=file_name,
+                    file_type=file_type,
+                    file_hash=file_hash,
+                    document_id=document_id,
+                    ensure_partition=False
+                )
+            else:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        if delete_ids:
+            # Removed chunks were visible to every department if the old version was cross-dept
+            was_cross_dept = any(r.is_cross_dept for r in existing)
+            on_department_data_changed(self.department, affects_all_departments=is_cross_dept or was_cross_dept)
+        
+        return {"kept": len(keep_ids), "inserted": inserted, "deleted": len(delete_ids), "document_id": document_id}
+    
+    @staticmethod
+    def _vector_literal(vector):
+        """Format a vector as a pgvector text literal ('[x,y,...]')"""
+        vector_list = vector.tolist() if isinstance(vector, np.ndarray) else vector
+        return '[' + ','.join(map(repr, map(float, vector_list))) + ']'
+    
+    def _insert_batch(self, batch_vectors, batch_docs, shared):
+        """Insert a batch of chunks with one multi-row INSERT statement"""
+        if len(batch_docs) == 0:
+            return 0
+        
+        rows_sql = []
+        params = dict(shared)
+        
+        for n, (vector, doc) in enumerate(zip(batch_vectors, batch_docs)):
+            rows_sql.append(
+                f"(:dept, :dept_part, :content_{n}, CAST(:metadata_{n} AS jsonb), CAST(:embedding_{n} AS vector), "
+                f":access, :cross, :source, :uploader, :fname, :ftype, :fid, :fhash, :doc_id)"
+            )
+            params[f"content_{n}"] = doc.page_content
+            params[f"metadata_{n}"] = json.dumps(doc.metadata) if doc.metadata else '{}'
+            params[f"embedding_{n}"] = self._vector_literal(vector)
+        
+        db.session.execute(
+            text(f"""
+                INSERT INTO document_embeddings 
+                (department, dept_partition, content, metadata, embedding, access_level, 
+                 is_cross_dept, source_type, uploaded_by, file_name, file_type, feedback_id, file_hash,
+                 document_id)
+                VALUES {", ".join(rows_sql)}
+            """),
+            params
+        )
+        return len(rows_sql)
+    
+    def _insert_rows_individually(self, batch_vectors, batch_docs, shared, offset):
+        """
+        Slow path: one INSERT per chunk inside a SAVEPOINT so a bad row
+        is reported and skipped without aborting the whole upload
+        """
+        inserted = 0
+        for n, (vector, doc) in enumerate(zip(batch_vectors, batch_docs)):
+            try:
+                with db.session.begin_nested():
+                    self._insert_batch([vector], [doc], shared)
+                inserted += 1
+            except Exception as e:
+                print(f"⚠️ Error inserting vector {offset + n + 1}: {str(e)}")
+                continue
+        return inserted
+    
+    def get_access_levels(self):
+        """Access levels visible to this store's user (public only when anonymous)"""
+        access_levels = ['public']
+        if self.user:
+            levels = ['public', 'employee', 'manager', 'senior_mgmt', 'executive']
+            try:
+                user_level_index = levels.index(self.user.access_level)
+                access_levels = levels[:user_level_index + 1]
+            except ValueError:
+                pass
+        return access_levels
+    
+    def search(self, query_vector, k=5, similarity_threshold=0.7, query_text=None, hybrid_alpha=0.7,
+               ef_search=None, probes=None):
         """
         ENHANCED: Hybrid search combining vector similarity and keyword matching
         
         Search strategy:
         1. Vector search (semantic understanding)
-        2. Keyword search (exact term matching) - if query_text provided
+        2. Keyword search (full-text index, ts_rank_cd) - if query_text provided
         3. Combine with weighted scoring
         4. Primary KB → Secondary KB fallback
         
@@ -105,6 +367,7 @@ class PostgresVectorStore:
             similarity_threshold: Minimum similarity for Primary KB (0.7 = 70%)
             query_text: Original text query for keyword matching (optional)
             hybrid_alpha: Weight for vector vs keyword (0.7 = 70% vector, 30% keyword)
+            ef_search / probes: Optional per-query HNSW / IVFFlat recall overrides
         
         Returns:
             List[Document]: Retrieved documents with metadata
@@ -114,14 +377,11 @@ class PostgresVectorStore:
                 query_vector = query_vector.tolist()
             
             # Build access level filter
-            access_levels = ['public']
-            if self.user:
-                levels = ['public', 'employee', 'manager', 'senior_mgmt', 'executive']
-                try:
-                    user_level_index = levels.index(self.user.access_level)
-                    access_levels = levels[:user_level_index + 1]
-                except ValueError:
-                    pass
+            access_levels = self.get_access_levels()
+            
+            # Per-query ANN tuning (connection defaults otherwise)
+            apply_search_settings(ef_search=ef_search, probes=probes)
+            self._search_settings = {"ef_search": ef_search, "probes": probes}
             
             # ✅ BUG #8 FIX: Hybrid search implementation
             if query_text and len(query_text.strip()) > 0:
@@ -146,6 +406,145 @@ class PostgresVectorStore:
                                 hybrid_alpha, access_levels):
         """
         Internal hybrid search combining vector and keyword matching
+        
+        Uses one server-side query (Config.HYBRID_SEARCH_SINGLE_QUERY, default) or
+        the multi-query path that merges results in Python, optionally running
+        its queries concurrently (Config.RETRIEVAL_PARALLEL_MODE).
+        """
+        if Config.HYBRID_SEARCH_SINGLE_QUERY:
+            return self._hybrid_search_single_query(
+                query_vector, query_text, k, similarity_threshold,
+                hybrid_alpha, access_levels
+            )
+        if Config.RETRIEVAL_PARALLEL_MODE in ('per_kb', 'speculative'):
+            return self._hybrid_search_parallel(
+                query_vector, query_text, k, similarity_threshold, hybrid_alpha,
+                access_levels, speculative=Config.RETRIEVAL_PARALLEL_MODE == 'speculative'
+            )
+        return self._hybrid_search_sequential(
+            query_vector, query_text, k, similarity_threshold,
+            hybrid_alpha, access_levels
+        )
+    
+    def _build_hybrid_query(self, query_vector, keywords, k, similarity_threshold,
+                            hybrid_alpha, access_levels):
+        """
+        Build the single-round-trip hybrid query
+        
+        Vector and full-text candidates for both KBs are gathered in CTEs, merged per
+        chunk id and scored in SQL. Secondary KB rows only survive when the best
+        Primary KB score is below the threshold (same rule as the sequential path).
+        
+        Returns:
+            tuple: (sql, params)
+        """
+        params = {
+            "vec": self._vector_literal(query_vector),
+            "access_levels": access_levels,
+            "dept": self.department,
+            "lim": k * 2,
+            "k": k,
+            "alpha": hybrid_alpha,
+            "threshold": similarity_threshold
+        }
+        
+        vector_branch = """
+            (SELECT id, 1 - (embedding <=> CAST(:vec AS vector)) AS vector_score, 0.0 AS keyword_score
+             FROM document_embeddings
+             WHERE source_type = '{source}'
+               AND access_level = ANY(:access_levels)
+               {dept_filter}
+             ORDER BY embedding <=> CAST(:vec AS vector)
+             LIMIT :lim)
+        """
+        branches = [
+            vector_branch.format(source='primary', dept_filter="AND dept_partition IN (:dept, '_cross_dept')"),
+            vector_branch.format(source='secondary', dept_filter="")
+        ]
+        
+        if keywords:
+            params["tsq"] = self._keywords_to_tsquery(keywords)
+            params["kw_terms"] = self._keyword_terms(keywords)
+            keyword_branch = """
+                (SELECT id, 0.0 AS vector_score, COALESCE(matched, 0) AS keyword_score
+                 FROM (
+                     SELECT id, """ + KEYWORD_SCORE_SQL + """ AS matched,
+                            ts_rank_cd(content_tsv, websearch_to_tsquery('english', :tsq), 1) AS rank
+                     FROM document_embeddings
+                     WHERE source_type = '{source}'
+                       AND access_level = ANY(:access_levels)
+                       {dept_filter}
+                       AND content_tsv @@ websearch_to_tsquery('english', :tsq)
+                     ORDER BY matched DESC NULLS LAST, rank DESC
+                     LIMIT :lim
+                 ) ranked_{source})
+            """
+            branches += [
+                keyword_branch.format(source='primary', dept_filter="AND dept_partition IN (:dept, '_cross_dept')"),
+                keyword_branch.format(source='secondary', dept_filter="")
+            ]
+        
+        sql = f"""
+            WITH candidates AS (
+                {" UNION ALL ".join(branches)}
+            ),
+            merged AS (
+                SELECT id, MAX(vector_score) AS vector_score, COALESCE(MAX(keyword_score), 0) AS keyword_score
+                FROM candidates
+                GROUP BY id
+            ),
+            scored AS (
+                SELECT d.id, d.content, d.metadata, d.file_name, d.source_type,
+                       m.vector_score, m.keyword_score,
+                       :alpha * m.vector_score + (1 - :alpha) * m.keyword_score AS score
+                FROM merged m
+                JOIN document_embeddings d ON d.id = m.id
+            ),
+            primary_strength AS (
+                SELECT COALESCE(MAX(score), 0) AS max_score
+                FROM scored
+                WHERE source_type = 'primary'
+            )
+            SELECT s.*, p.max_score AS primary_max_score
+            FROM scored s CROSS JOIN primary_strength p
+            WHERE s.source_type = 'primary' OR p.max_score < :threshold
+            ORDER BY s.score DESC
+            LIMIT :k
+        """
+        return sql, params
+    
+    def _hybrid_search_single_query(self, query_vector, query_text, k, similarity_threshold,
+                                    hybrid_alpha, access_levels):
+        """Hybrid search for both KBs in one database round trip"""
+        keywords = self._extract_keywords(query_text)
+        print(f"  📊 Single-query hybrid search (keywords: {keywords})...")
+        
+        sql, params = self._build_hybrid_query(
+            query_vector, keywords, k, similarity_threshold, hybrid_alpha, access_levels
+        )
+        rows = db.session.execute(text(sql), params).fetchall()
+        
+        results = [{'id': r.id, 'content': r.content, 'metadata': r.metadata,
+                    'file_name': r.file_name, 'source_type': r.source_type,
+                    'vector_score': float(r.vector_score), 'keyword_score': float(r.keyword_score),
+                    'score': float(r.score)}
+                   for r in rows]
+        
+        if rows:
+            print(f"  📈 Primary KB max score: {float(rows[0].primary_max_score):.2f}")
+        
+        documents = self._results_to_documents(results)
+        
+        primary_count = sum(1 for d in documents if d.metadata['source_type'] == 'primary')
+        secondary_count = sum(1 for d in documents if d.metadata['source_type'] == 'secondary')
+        print(f"✅ Hybrid search: {len(documents)} results ({primary_count} Primary, {secondary_count} Secondary)")
+        
+        return documents
+    
+    def _hybrid_search_sequential(self, query_vector, query_text, k, similarity_threshold, 
+                                  hybrid_alpha, access_levels):
+        """
+        Original hybrid search: separate vector/keyword queries per KB merged in Python
         """
         # Extract keywords from query
         keywords = self._extract_keywords(query_text)
@@ -168,11 +567,7 @@ class PostgresVectorStore:
         )
         
         # Check if Primary KB has good results
-        has_good_primary = False
-        if combined_primary:
-            max_score = max(r['score'] for r in combined_primary)
-            has_good_primary = max_score >= similarity_threshold
-            print(f"  📈 Primary KB: {len(combined_primary)} results, max score: {max_score:.2f}")
+        has_good_primary = self._primary_is_strong(combined_primary, similarity_threshold)
         
         # STEP 4: If Primary weak, also search Secondary KB
         combined_secondary = []
@@ -188,18 +583,79 @@ class PostgresVectorStore:
             combined_secondary = self._combine_results(
                 vector_secondary, keyword_secondary, hybrid_alpha
             )
-            
-            if combined_secondary:
-                max_sec_score = max(r['score'] for r in combined_secondary)
-                print(f"  📈 Secondary KB: {len(combined_secondary)} results, max score: {max_sec_score:.2f}")
         
-        # STEP 5: Merge and sort all results
+        # STEP 5-6: Merge, sort and convert to Document objects
+        return self._merge_kb_results(combined_primary, combined_secondary, k)
+    
+    def _hybrid_search_parallel(self, query_vector, query_text, k, similarity_threshold,
+                                hybrid_alpha, access_levels, speculative=False):
+        """
+        Multi-query hybrid search with the vector and keyword queries run concurrently
+        
+        Each query runs on its own pooled connection (up to 4 per search).
+        - per_kb (speculative=False): Primary vector + keyword together, then
+          Secondary vector + keyword together only if Primary is weak. Same DB
+          load as the sequential path, about half the round-trip latency.
+        - speculative: all four queries at once; Secondary results are dropped
+          when Primary is strong. Always pays for the Secondary queries, but a
+          weak-Primary question no longer waits for a second round.
+        """
+        keywords = self._extract_keywords(query_text)
+        engine = db.engine
+        settings = dict(self._search_settings)
+        
+        def run(fn, *args):
+            def task():
+                with engine.connect() as conn:
+                    apply_search_settings(conn=conn, **settings)
+                    return fn(*args, conn=conn)
+            return _retrieval_pool.submit(task)
+        
+        def submit_kb(source_type):
+            return (
+                run(self._get_vector_results, query_vector, source_type, k * 2, access_levels),
+                run(self._get_keyword_results, query_text, keywords, source_type, k * 2, access_levels)
+            )
+        
+        primary_futures = submit_kb('primary')
+        secondary_futures = submit_kb('secondary') if speculative else None
+        
+        combined_primary = self._combine_results(
+            primary_futures[0].result(), primary_futures[1].result(), hybrid_alpha
+        )
+        has_good_primary = self._primary_is_strong(combined_primary, similarity_threshold)
+        
+        combined_secondary = []
+        if has_good_primary:
+            if secondary_futures:
+                print(f"  ⚡ Primary KB strong, discarding speculative Secondary KB results")
+        else:
+            print(f"  🔍 Primary KB weak, using Secondary KB...")
+            if secondary_futures is None:
+                secondary_futures = submit_kb('secondary')
+            combined_secondary = self._combine_results(
+                secondary_futures[0].result(), secondary_futures[1].result(), hybrid_alpha
+            )
+        
+        return self._merge_kb_results(combined_primary, combined_secondary, k)
+    
+    def _primary_is_strong(self, combined_primary, similarity_threshold):
+        """True if the best Primary KB score clears the threshold (no Secondary fallback needed)"""
+        if not combined_primary:
+            return False
+        max_score = max(r['score'] for r in combined_primary)
+        print(f"  📈 Primary KB: {len(combined_primary)} results, max score: {max_score:.2f}")
+        return max_score >= similarity_threshold
+    
+    def _merge_kb_results(self, combined_primary, combined_secondary, k):
+        """Merge scored Primary and Secondary results into the top-k Documents"""
+        if combined_secondary:
+            max_sec_score = max(r['score'] for r in combined_secondary)
+            print(f"  📈 Secondary KB: {len(combined_secondary)} results, max score: {max_sec_score:.2f}")
+        
         all_results = combined_primary + combined_secondary
         all_results.sort(key=lambda x: x['score'], reverse=True)
-        all_results = all_results[:k]
-        
-        # STEP 6: Convert to Document objects
-        documents = self._results_to_documents(all_results)
+        documents = self._results_to_documents(all_results[:k])
         
         # Log summary
         primary_count = sum(1 for d in documents if d.metadata['source_type'] == 'primary')
@@ -217,11 +673,11 @@ class PostgresVectorStore:
         primary_results = db.session.execute(
             text("""
                 SELECT 
-                    content, metadata, file_name, source_type,
+                    id, content, metadata, file_name, source_type,
                     1 - (embedding <=> CAST(:query_embedding AS vector)) as similarity
                 FROM document_embeddings
                 WHERE 
-                    (department = :dept OR is_cross_dept = true)
+                    dept_partition IN (:dept, '_cross_dept')
                     AND access_level = ANY(:access_levels)
                     AND source_type = 'primary'
                 ORDER BY embedding <=> CAST(:query_embedding AS vector)
@@ -249,7 +705,7 @@ class PostgresVectorStore:
             secondary_results = db.session.execute(
                 text("""
                     SELECT 
-                        content, metadata, file_name, source_type,
+                        id, content, metadata, file_name, source_type,
                         1 - (embedding <=> CAST(:query_embedding AS vector)) as similarity
                     FROM document_embeddings
                     WHERE 
@@ -281,6 +737,7 @@ class PostgresVectorStore:
             except:
                 metadata = {}
             
+            metadata['chunk_id'] = row.id
             metadata['file_name'] = row.file_name
             metadata['similarity'] = float(row.similarity)
             metadata['source_type'] = row.source_type
@@ -298,9 +755,9 @@ class PostgresVectorStore:
         keywords = [w for w in words if w not in stopwords and len(w) > 2]
         return keywords[:5]  # Top 5 keywords
     
-    def _get_vector_results(self, query_vector, source_type, limit, access_levels):
-        """Get vector similarity results"""
-        results = db.session.execute(
+    def _get_vector_results(self, query_vector, source_type, limit, access_levels, conn=None):
+        """Get vector similarity results (on conn if given, else the request session)"""
+        results = (conn if conn is not None else db.session).execute(
             text("""
                 SELECT 
                     id, content, metadata, file_name, source_type,
@@ -309,7 +766,7 @@ class PostgresVectorStore:
                 WHERE 
                     source_type = :source
                     AND access_level = ANY(:access_levels)
-                    AND (department = :dept OR is_cross_dept = true OR :source = 'secondary')
+                    AND (dept_partition IN (:dept, '_cross_dept') OR :source = 'secondary')
                 ORDER BY embedding <=> CAST(:vec AS vector)
                 LIMIT :lim
             """),
@@ -327,59 +784,63 @@ class PostgresVectorStore:
                  'vector_score': float(r.similarity), 'keyword_score': 0.0} 
                 for r in results]
     
-    def _get_keyword_results(self, query_text, keywords, source_type, limit, access_levels):
-        """Get keyword matching results using ILIKE"""
-        if not keywords:
-            return []
+    def _keywords_to_tsquery(self, keywords):
+        """
+        OR the extracted keywords into websearch_to_tsquery() input ('kw1 or kw2 or ...')
         
-        # Build ILIKE conditions for each keyword
-        ilike_conditions = []
-        params = {
-            "source": source_type,
-            "access_levels": access_levels,
-            "dept": self.department,
-            "lim": limit
-        }
+        Unlike to_tsquery, websearch_to_tsquery never raises on operator characters in user text
+        """
+        return " or ".join(self._keyword_terms(keywords))
+    
+    def _keyword_terms(self, keywords):
+        """Single words of the extracted keywords (what keyword_score counts)"""
+        return [w for kw in keywords for w in re.findall(r'\w+', kw)]
+    
+    def _get_keyword_results(self, query_text, keywords, source_type, limit, access_levels, conn=None):
+        """
+        Get keyword matching results from the content_tsv full-text index
         
-        for i, kw in enumerate(keywords):
-            param_name = f"kw{i}"
-            ilike_conditions.append(f"content ILIKE :{param_name}")
-            params[param_name] = f"%{kw}%"
-        
-        where_clause = " OR ".join(ilike_conditions)
-        
-        query = f"""
-            SELECT 
-                id, content, metadata, file_name, source_type
-            FROM document_embeddings
-            WHERE 
-                source_type = :source
-                AND access_level = ANY(:access_levels)
-                AND (department = :dept OR is_cross_dept = true OR :source = 'secondary')
-                AND ({where_clause})
-            LIMIT :lim
+        keyword_score is the fraction of the keywords the chunk contains (after
+        stemming), an absolute 0..1 score; length-normalized ts_rank_cd only orders
+        candidates with the same fraction
         """
+        if not keywords:
+            return []
         
-        results = db.session.execute(text(query), params).fetchall()
+        results = (conn if conn is not None else db.session).execute(
+            text("""
+                SELECT 
+                    id, content, metadata, file_name, source_type,
+                    COALESCE(matched, 0) AS keyword_score
+                FROM (
+                    SELECT 
+                        id, content, metadata, file_name, source_type,
+                        """ + KEYWORD_SCORE_SQL + """ AS matched,
+                        ts_rank_cd(content_tsv, websearch_to_tsquery('english', :tsq), 1) AS rank
+                    FROM document_embeddings
+                    WHERE 
+                        source_type = :source
+                        AND access_level = ANY(:access_levels)
+                        AND (dept_partition IN (:dept, '_cross_dept') OR :source = 'secondary')
+                        AND content_tsv @@ websearch_to_tsquery('english', :tsq)
+                    ORDER BY matched DESC NULLS LAST, rank DESC
+                    LIMIT :lim
+                ) ranked
+            """),
+            {
+                "tsq": self._keywords_to_tsquery(keywords),
+                "kw_terms": self._keyword_terms(keywords),
+                "source": source_type,
+                "access_levels": access_levels,
+                "dept": self.department,
+                "lim": limit
+            }
+        ).fetchall()
         
-        # Calculate keyword match score
-        keyword_results = []
-        for r in results:
-            content_lower = r.content.lower()
-            matches = sum(1 for kw in keywords if kw in content_lower)
-            keyword_score = matches / len(keywords)  # Proportion of keywords found
-            
-            keyword_results.append({
-                'id': r.id,
-                'content': r.content,
-                'metadata': r.metadata,
-                'file_name': r.file_name,
-                'source_type': r.source_type,
-                'vector_score': 0.0,
-                'keyword_score': keyword_score
-            })
-        
-        return keyword_results
+        return [{'id': r.id, 'content': r.content, 'metadata': r.metadata,
+                 'file_name': r.file_name, 'source_type': r.source_type,
+                 'vector_score': 0.0, 'keyword_score': float(r.keyword_score or 0.0)}
+                for r in results]
     
     def _combine_results(self, vector_results, keyword_results, alpha):
         """
@@ -423,6 +884,7 @@ class PostgresVectorStore:
             except:
                 metadata = {}
             
+            metadata['chunk_id'] = r['id']
             metadata['file_name'] = r['file_name']
             metadata['similarity'] = r['score']  # Hybrid score
             metadata['vector_score'] = r['vector_score']
@@ -438,15 +900,40 @@ class PostgresVectorStore:
         return documents
     
     def delete_department_data(self):
-        """Delete all vectors for this department"""
+        """
+        Delete all vectors for this department
+        
+        The department's own primary partition is detached (in its own short
+        transaction) and dropped outright after the commit; only its
+        cross-department and Secondary KB rows need a DELETE.
+        """
         try:
+            detached, dropped = detach_department_partition(self.department)
+            had_shared_rows = db.session.execute(
+                text("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM document_embeddings
+                        WHERE department = :dept
+                          AND (is_cross_dept = true OR source_type = 'secondary')
+                    )
+                """),
+                {"dept": self.department}
+            ).scalar()
             result = db.session.execute(
                 text("DELETE FROM document_embeddings WHERE department = :dept"),
                 {"dept": self.department}
             )
+            db.session.execute(
+                text("DELETE FROM documents WHERE department = :dept"),
+                {"dept": self.department}
+            )
             db.session.commit()
-            print(f"✅ Deleted {result.rowcount} records for department: {self.department}")
-            return result.rowcount
+            drop_detached_partition(detached)
+            on_department_data_changed(self.department, affects_all_departments=bool(had_shared_rows))
+            deleted = dropped + result.rowcount
+            print(f"✅ Deleted {deleted} records for department: {self.department} "
+                  f"({dropped} via partition drop)")
+            return deleted
         except Exception as e:
             db.session.rollback()
             print(f"❌ Error deleting department data: {str(e)}")
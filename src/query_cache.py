@@ -0,0 +1,266 @@
+"""
+In-process caches for the chat hot path
+
+TTLLRUCache is a small thread-safe LRU map whose entries also expire after a
+TTL. QueryEmbeddingCache uses it to share question embeddings between every
+RAGChatbot in the worker, optionally backed by Redis so repeat questions are
+also shared across gunicorn workers. SemanticAnswerCache reuses LLM answers
+for near-identical questions that retrieved the same chunks.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from config import Config
+
+try:
+    import redis  # Optional: only needed for the cross-worker backend
+except ImportError:
+    redis = None
+
+
+class TTLLRUCache:
+    """Thread-safe LRU cache with per-entry time-to-live and hit/miss counters"""
+
+    def __init__(self, maxsize=1024, ttl=3600, sliding=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding  # True: ttl is an idle timeout, refreshed on every hit
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return default
+
+            if self.sliding:
+                self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[1] if entry else default
+
+    def invalidate_where(self, predicate):
+        """Drop every entry whose key matches predicate(key); returns the count"""
+        with self._lock:
+            doomed = [k for k in self._data if predicate(k)]
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, oldest first"""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (expires_at, v) in self._data.items() if expires_at >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _purge_expired(self):
+        """Drop expired entries; call with _lock held"""
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._data.items() if expires_at < now]
+        for k in expired:
+            del self._data[k]
+        self.evictions += len(expired)
+
+    def __len__(self):
+        """Number of live (unexpired) entries"""
+        with self._lock:
+            self._purge_expired()
+            return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            self._purge_expired()
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class QueryEmbeddingCache:
+    """Question text -> embedding, shared by all chatbots in the process"""
+
+    def __init__(self, maxsize=2048, ttl=3600, redis_url=None, deployment=None):
+        self.local = TTLLRUCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.deployment = deployment or Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT or 'default'
+        self.remote = None
+        self.remote_hits = 0
+
+        if redis_url:
+            if redis is None:
+                print("⚠️ QUERY_EMBEDDING_CACHE_URL set but the 'redis' package is not installed - using local cache only")
+            else:
+                self.remote = redis.Redis.from_url(redis_url)
+
+    def _key(self, question):
+        normalized = re.sub(r'\s+', ' ', question).strip()
+        return f"qemb:{self.deployment}:{normalized}"
+
+    def embed_query(self, embedder, question):
+        """Return the cached embedding for question, embedding it on a miss"""
+        key = self._key(question)
+
+        vector = self.local.get(key)
+        if vector is not None:
+            return vector
+
+        if self.remote is not None:
+            try:
+                raw = self.remote.get(key)
+                if raw is not None:
+                    vector = json.loads(raw)
+                    self.local.set(key, vector)
+                    self.remote_hits += 1
+                    return vector
+            except Exception as e:
+                print(f"⚠️ Query embedding cache backend error: {e}")
+
+        vector = embedder.embed_query(question)
+        self.local.set(key, vector)
+
+        if self.remote is not None:
+            try:
+                self.remote.set(key, json.dumps(vector), ex=self.ttl)
+            except Exception as e:
+                print(f"⚠️ Query embedding cache backend error: {e}")
+
+        return vector
+
+    def stats(self):
+        stats = self.local.stats()
+        stats["remote_hits"] = self.remote_hits
+        stats["backend"] = "redis" if self.remote is not None else "memory"
+        return stats
+
+
+class SemanticAnswerCache:
+    """
+    Cached LLM answers keyed by (department, access levels, retrieved chunk ids,
+    hash of the conversation history included in the prompt)
+    
+    Within a key, a stored answer is served when the new question's embedding
+    is within max_distance (cosine distance) of the question it answered.
+    
+    The history hash keeps an answer written for one conversation's follow-up
+    from being served in another conversation. Staleness across worker
+    processes is bounded by the key itself: chunk ids are never reused (a
+    re-indexed or re-permissioned chunk gets a new id), and the key is built
+    from chunks this request has just retrieved, so an entry can only match
+    while every chunk it was generated from is still stored and visible.
+    invalidate_department() just frees memory early in the writing process.
+    """
+
+    def __init__(self, maxsize=1024, ttl=1800, max_distance=0.05, per_key=8):
+        self.entries = TTLLRUCache(maxsize=maxsize, ttl=ttl)
+        self.max_distance = max_distance
+        self.per_key = per_key  # question variants kept per retrieval key
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(department, access_levels, chunk_ids, history_text=''):
+        history_hash = hashlib.sha256(history_text.encode('utf-8')).hexdigest() if history_text else ''
+        return (department, tuple(sorted(access_levels)), tuple(sorted(chunk_ids)), history_hash)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype='float32')
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, key, query_vector):
+        """Return a cached answer for a semantically equivalent question, or None"""
+        candidates = self.entries.get(key)
+        if not candidates:
+            return None
+
+        query = self._unit(query_vector)
+        best_answer, best_distance = None, None
+        for vector, answer in candidates:
+            distance = 1.0 - float(np.dot(query, vector))
+            if best_distance is None or distance < best_distance:
+                best_answer, best_distance = answer, distance
+
+        if best_distance is not None and best_distance <= self.max_distance:
+            print(f"⚡ Answer cache hit (cosine distance {best_distance:.3f})")
+            return best_answer
+        return None
+
+    def set(self, key, query_vector, answer):
+        candidates = list(self.entries.pop(key) or [])
+        candidates.append((self._unit(query_vector), answer))
+        self.entries.set(key, candidates[-self.per_key:])
+
+    def invalidate_department(self, department=None):
+        """
+        Drop answers that could have used this department's chunks
+        (department=None clears everything, e.g. for cross-dept or Secondary KB changes)
+        """
+        if department is None:
+            count = len(self.entries)
+            self.entries.clear()
+        else:
+            count = self.entries.invalidate_where(lambda key: key[0] == department)
+        self.invalidations += count
+        if count:
+            print(f"🧹 Answer cache: invalidated {count} entries ({department or 'all departments'})")
+        return count
+
+    def stats(self):
+        stats = self.entries.stats()
+        stats["invalidations"] = self.invalidations
+        stats["max_distance"] = self.max_distance
+        return stats
+
+
+# Process-wide instance used by every RAGChatbot
+query_embedding_cache = QueryEmbeddingCache(
+    maxsize=Config.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=Config.QUERY_EMBEDDING_CACHE_TTL,
+    redis_url=Config.QUERY_EMBEDDING_CACHE_URL
+)
+
+# Process-wide semantic answer cache, invalidated by PostgresVectorStore writes
+answer_cache = SemanticAnswerCache(
+    maxsize=Config.ANSWER_CACHE_SIZE,
+    ttl=Config.ANSWER_CACHE_TTL,
+    max_distance=Config.ANSWER_CACHE_MAX_DISTANCE
+)
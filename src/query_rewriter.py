@@ -0,0 +1,204 @@
+"""
+Local coreference rewriting for follow-up questions
+
+Most follow-ups ("what is his notice period?") refer to the one person named
+in the previous question, so they can be made standalone without an LLM call.
+rewrite() finds references on word boundaries (the old substring check also
+matched 'the', 'where', 'other', ...), carries the entity over from the last
+turn and substitutes it. It reports whether it is confident; only when it is
+not does RAGChatbot fall back to the LLM rewrite.
+
+The heuristics err on the side of not being confident: a capitalized word that
+merely starts a sentence ("Explain maternity leave") is not a name, only
+person-like entities replace he/she/him/her, and a question with several
+references or several candidate antecedents always goes to the LLM.
+"""
+
+import re
+import threading
+import time
+
+# Reference -> how the entity is substituted ('subject'/'object' -> name, 'possessive' -> name's)
+REFERENCES = {
+    'he': 'subject', 'she': 'subject', 'him': 'object', 'his': 'possessive',
+    'hers': 'possessive', 'himself': 'object', 'herself': 'object',
+    'her': None,  # object or possessive, decided by the next word
+    'they': 'plural', 'them': 'plural', 'their': 'plural', 'theirs': 'plural',
+}
+REFERENCE_PHRASES = ['the candidate', 'that candidate', 'this candidate', 'that person', 'this person']
+
+_REFERENCE_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, REFERENCE_PHRASES + list(REFERENCES))) + r")\b",
+    re.IGNORECASE
+)
+
+# Capitalized words that start questions or sentences rather than name someone
+_NOT_ENTITIES = {
+    'what', 'who', 'whom', 'whose', 'which', 'when', 'where', 'why', 'how', 'is', 'are', 'was',
+    'were', 'do', 'does', 'did', 'can', 'could', 'should', 'would', 'will', 'tell', 'show',
+    'give', 'list', 'find', 'please', 'the', 'a', 'an', 'and', 'or', 'in', 'on', 'for', 'of',
+    'to', 'i', 'we', 'you', 'he', 'she', 'they', 'it', 'this', 'that', 'these', 'those',
+    'source', 'based', 'according', 'yes', 'no', 'q', 'cv', 'resume', 'pdf',
+}
+# Words that make an entity a thing or place rather than a person
+_NON_PERSON_WORDS = {
+    'policy', 'policies', 'leave', 'department', 'dept', 'office', 'plant', 'unit', 'division',
+    'team', 'company', 'ltd', 'limited', 'pvt', 'cement', 'group', 'act', 'rules', 'manual',
+    'handbook', 'form', 'section', 'report', 'committee', 'board', 'branch', 'region', 'city',
+    'state', 'district', 'road', 'street', 'bank', 'hospital', 'university', 'college', 'school',
+}
+# "the plant head at Guwahati": an entity right after one of these is a place
+_PLACE_PREPOSITIONS = {'at', 'in', 'from', 'near', 'into', 'within', 'across', 'inside', 'outside', 'via'}
+
+_ENTITY_RE = re.compile(r"\b[A-Z][a-zA-Z'.-]+(?:\s+[A-Z][a-zA-Z'.-]+)*")
+_CAPITALIZED_RE = re.compile(r"\b[A-Z][a-zA-Z'.-]+")
+_HTML_RE = re.compile(r"<[^>]+>")
+
+
+def find_references(question):
+    """Pronouns / referring phrases in the question, matched on word boundaries"""
+    return [m.group(0) for m in _REFERENCE_RE.finditer(question)]
+
+
+def _at_sentence_start(text, pos):
+    prefix = text[:pos].rstrip(' \t"\'“‘(')
+    return not prefix or prefix[-1] in '.!?:\n'
+
+
+def _clean_word(word):
+    return re.sub(r"'s$", "", word.strip(".'"))
+
+
+def _looks_like_person(words, preceding_word):
+    if preceding_word in _PLACE_PREPOSITIONS:
+        return False
+    for word in words:
+        if word.lower() in _NON_PERSON_WORDS or word.lower() in _NOT_ENTITIES:
+            return False
+        if len(word) > 1 and word.isupper():  # HR, CFO, GST
+            return False
+    return True
+
+
+def extract_entities(text, persons_only=False):
+    """
+    Distinct capitalized name sequences (leading question words stripped), in order
+
+    A single capitalized word at the start of a sentence is ignored unless the
+    same word is also capitalized mid-sentence elsewhere in the text. With
+    persons_only, sequences that look like places or things are skipped.
+    """
+    text = _HTML_RE.sub(" ", text)
+    mid_sentence = {
+        _clean_word(m.group(0)) for m in _CAPITALIZED_RE.finditer(text)
+        if not _at_sentence_start(text, m.start())
+    }
+
+    entities = []
+    for match in _ENTITY_RE.finditer(text):
+        words = match.group(0).split()
+        sentence_start = _at_sentence_start(text, match.start())
+        while words and words[0].lower().strip(".'") in _NOT_ENTITIES:
+            words.pop(0)
+            sentence_start = False
+        words = [_clean_word(w) for w in words]
+        words = [w for w in words if w]
+        if not words:
+            continue
+        if sentence_start and len(words) == 1 and words[0] not in mid_sentence:
+            continue
+
+        if persons_only:
+            before = text[:match.start()].split()
+            preceding_word = before[-1].lower().strip(".,;'\"") if before else ''
+            if not _looks_like_person(words, preceding_word):
+                continue
+
+        entity = " ".join(words)
+        if entity not in entities:
+            entities.append(entity)
+    return entities
+
+
+class RewriteStats:
+    """Counts how often the local stage avoided the LLM, and what each stage cost"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_attempts = 0
+        self.local_rewrites = 0
+        self.llm_rewrites = 0
+        self.local_seconds = 0.0
+        self.llm_seconds = 0.0
+
+    def record_local(self, seconds, confident):
+        with self._lock:
+            self.local_attempts += 1
+            self.local_seconds += seconds
+            if confident:
+                self.local_rewrites += 1
+
+    def record_llm(self, seconds):
+        with self._lock:
+            self.llm_rewrites += 1
+            self.llm_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            needed = self.local_rewrites + self.llm_rewrites
+            return {
+                "local_attempts": self.local_attempts,
+                "local_rewrites": self.local_rewrites,
+                "llm_rewrites": self.llm_rewrites,
+                "llm_skip_rate": round(self.local_rewrites / needed, 4) if needed else 0.0,
+                "avg_local_ms": round(self.local_seconds * 1000 / self.local_attempts, 3) if self.local_attempts else 0.0,
+                "avg_llm_ms": round(self.llm_seconds * 1000 / self.llm_rewrites, 1) if self.llm_rewrites else 0.0
+            }
+
+
+rewrite_stats = RewriteStats()
+
+
+def _substitute(question, entity):
+    def replace(match):
+        word = match.group(0)
+        kind = REFERENCES.get(word.lower(), 'subject')
+        if kind is None:
+            # 'her' + noun is possessive ("her salary"), otherwise object ("ask her")
+            following = question[match.end():].lstrip()
+            kind = 'possessive' if following[:1].isalpha() and not following.lower().startswith(('and ', 'or ')) else 'object'
+        return f"{entity}'s" if kind == 'possessive' else entity
+    return _REFERENCE_RE.sub(replace, question)
+
+
+def rewrite(question, last_turn):
+    """
+    Resolve references in question against the previous (question, answer) turn
+
+    Confident only when the question has exactly one singular reference and
+    exactly one person-like entity is named in the last question (or, failing
+    that, in the last answer). Otherwise the question is returned unchanged
+    for the LLM to resolve.
+
+    Returns:
+        tuple: (rewritten question, confident)
+    """
+    start = time.perf_counter()
+    references = find_references(question)
+    confident = False
+    rewritten = question
+
+    if len(references) == 1 and last_turn and REFERENCES.get(references[0].lower()) != 'plural':
+        last_question, last_answer = last_turn
+        # Names already in the new question are not candidates ("compare his skills with Priya's")
+        present = set(extract_entities(question))
+        candidates = [e for e in extract_entities(last_question, persons_only=True) if e not in present]
+        if not candidates:
+            candidates = [e for e in extract_entities(last_answer.split("<small>")[0], persons_only=True)
+                          if e not in present]
+        if len(candidates) == 1:
+            rewritten = _substitute(question, candidates[0])
+            confident = True
+
+    rewrite_stats.record_local(time.perf_counter() - start, confident)
+    return rewritten, confident
@@ -1,43 +1,64 @@
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
+from src.conversation_store import conversation_store
+from src.llm_clients import get_chat_llm, get_embeddings
+from src.query_cache import query_embedding_cache, answer_cache
+from src import query_rewriter
+from src.context_packer import pack_context, count_tokens
+
+# LLM query rewrites run here while the request thread retrieves for the raw question
+_pipeline_pool = ThreadPoolExecutor(
+    max_workers=Config.CHAT_PIPELINE_WORKERS,
+    thread_name_prefix="rewrite"
+)
 
 class RAGChatbot:
-    def __init__(self, store):
+    def __init__(self, store, session_key=None):
         self.store = store
-        self.llm = AzureChatOpenAI(
-            azure_deployment=Config.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_API_KEY,
-            api_version=Config.AZURE_OPENAI_API_VERSION,
-            temperature=0.1,
-            max_tokens=800,
-            timeout=30
-        )
-        self.embedder = AzureOpenAIEmbeddings(
-            azure_deployment=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
-            azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-            api_key=Config.AZURE_OPENAI_API_KEY,
-            api_version=Config.AZURE_OPENAI_API_VERSION
-        )
-        self.conversation_history = []
+        # History lives in the conversation store so any worker can serve the session
+        self.session_key = session_key or uuid.uuid4().hex
+        # Process-wide clients on a shared keep-alive connection pool
+        self.llm = get_chat_llm()
+        self.embedder = get_embeddings()
         
         # ✅ BUG #9 FIX: Minimum similarity threshold for LLM
         self.MIN_SIMILARITY = 0.6  # 60% - can be adjusted
     
-    def _enhance_query_with_context(self, question):
-        """
-        Enhance the current query with conversation context to resolve pronouns
-        and references like 'the candidate', 'his', 'her', etc.
+    @property
+    def conversation_history(self):
+        """Recent (question, answer) turns for this session, oldest first"""
+        return conversation_store.get(self.session_key) or []
+    
+    def _embed_query(self, question):
+        """Embed a question through the process-wide query-embedding cache"""
+        return query_embedding_cache.embed_query(self.embedder, question)
+    
+    def _rewrite_locally(self, question):
         """
-        if not self.conversation_history:
-            return question
+        Resolve references to the previous turn without an LLM call
         
-        pronouns = ['he', 'she', 'his', 'her', 'their', 'him', 'them', 'the candidate', 'that person']
-        needs_enhancement = any(pronoun in question.lower() for pronoun in pronouns)
+        Returns:
+            tuple: (query, needs_llm) - needs_llm is True when the question refers
+                   back to the conversation but the local rewrite is not confident
+        """
+        # Whole-word match: 'the', 'where', 'other' no longer trigger a rewrite
+        if not query_rewriter.find_references(question):
+            return question, False
         
-        if not needs_enhancement:
-            return question
+        history = self.conversation_history
+        if not history:
+            return question, False
         
+        rewritten, confident = query_rewriter.rewrite(question, history[-1])
+        if confident:
+            print(f"✏️ Local rewrite: {rewritten}")
+            return rewritten, False
+        return question, True
+    
+    def _rewrite_with_llm(self, question):
+        """Ask the LLM for a standalone version of a context-dependent question"""
         recent_context = "\n".join([
             f"Q: {q}\nA: {a}" 
             for q, a in self.conversation_history[-2:]
@@ -55,59 +76,77 @@ rewrite it as a standalone question with full context. Otherwise, return the que
 Return ONLY the rewritten question, nothing else.
 """
         
+        start = time.perf_counter()
         enhanced_query = self.llm.invoke(rewrite_prompt).content.strip()
+        query_rewriter.rewrite_stats.record_llm(time.perf_counter() - start)
         return enhanced_query
     
     def ask(self, question):
-        # Enhance query with conversation context
-        enhanced_question = self._enhance_query_with_context(question)
+        prepared = self._prepare_answer(question)
+        if 'answer' in prepared:
+            return prepared['answer']
         
-        # ✅ BUG #8 FIX: Use HYBRID search (vector + keyword)
-        # Generate embedding for vector search
-        q_emb = self.embedder.embed_query(enhanced_question)
+        answer = self.llm.invoke(prepared['prompt']).content
+        return self._finalize_answer(question, answer, prepared)
+    
+    def ask_stream(self, question):
+        """
+        Streaming variant of ask() using the LLM's streaming API
         
-        # Pass both vector AND text for hybrid search
-        docs = self.store.search(
-            query_vector=q_emb, 
-            k=5,  # Get more docs to filter
-            query_text=enhanced_question,
-            hybrid_alpha=0.7
-        )
+        Yields event dicts in order:
+            {'type': 'sources', 'sources': [...]}   as soon as retrieval finishes
+            {'type': 'token', 'content': '...'}     for each streamed chunk
+            {'type': 'done', 'answer': '...'}       full answer incl. source lines
+        """
+        prepared = self._prepare_answer(question)
+        yield {'type': 'sources', 'sources': prepared.get('sources', [])}
         
-        # ✅ BUG #9 FIX: Filter documents by similarity threshold
-        # Only use docs with similarity >= 60% to prevent hallucinations
-        filtered_docs = [
-            d for d in docs 
-            if d.metadata.get('similarity', 0) >= self.MIN_SIMILARITY
-        ]
+        if 'answer' in prepared:
+            # No confident docs, or served from the answer cache
+            yield {'type': 'token', 'content': prepared['answer']}
+            yield {'type': 'done', 'answer': prepared['answer']}
+            return
         
-        print(f"📊 Retrieved {len(docs)} docs, {len(filtered_docs)} above {self.MIN_SIMILARITY} threshold")
+        parts = []
+        for chunk in self.llm.stream(prepared['prompt']):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield {'type': 'token', 'content': chunk.content}
         
-        # If no high-quality docs, try with original question
-        if not filtered_docs:
-            print("⚠️ No docs above threshold, trying original question...")
-            q_emb = self.embedder.embed_query(question)
-            docs = self.store.search(
-                query_vector=q_emb, 
-                k=5,
-                query_text=question,
-                hybrid_alpha=0.7
-            )
-            
-            filtered_docs = [
-                d for d in docs 
-                if d.metadata.get('similarity', 0) >= self.MIN_SIMILARITY
-            ]
+        answer = self._finalize_answer(question, "".join(parts), prepared)
+        yield {'type': 'done', 'answer': answer}
+    
+    def _prepare_answer(self, question):
+        """
+        Retrieval and prompt building shared by ask() and ask_stream()
+        
+        Returns:
+            dict: {'answer', 'sources'?} when no LLM call is needed, otherwise
+                  {'prompt', 'sources', 'cache_key', 'q_emb'}
+        """
+        # Enhance query with conversation context (locally when confident, else via the LLM)
+        enhanced_question, needs_llm = self._rewrite_locally(question)
+        
+        if needs_llm and Config.CHAT_PIPELINE_ENABLED:
+            q_emb, filtered_docs = self._retrieve_pipelined(question)
+        else:
+            if needs_llm:
+                enhanced_question = self._rewrite_with_llm(question)
+            q_emb, filtered_docs = self._retrieve(enhanced_question)
             
-            print(f"📊 Second attempt: {len(docs)} docs, {len(filtered_docs)} above threshold")
+            # If no high-quality docs, try with original question
+            if not filtered_docs and enhanced_question != question:
+                print("⚠️ No docs above threshold, trying original question...")
+                q_emb, filtered_docs = self._retrieve(question)
         
         # If still no confident results, return "no answer" response
         if not filtered_docs:
             print(f"❌ No documents with similarity >= {self.MIN_SIMILARITY}")
-            return self._generate_no_confident_answer_response(question)
+            return {'answer': self._generate_no_confident_answer_response(question)}
         
-        # Use top 3 filtered docs
-        top_docs = filtered_docs[:3]
+        # Fill the token budget with the best docs (overlapping splitter text removed)
+        packed = pack_context(filtered_docs, self.conversation_history)
+        top_docs = packed['used_docs']
         
         # Log similarity scores
         for i, doc in enumerate(top_docs, 1):
@@ -115,15 +154,26 @@ Return ONLY the rewritten question, nothing else.
             source = doc.metadata.get('source_label', 'Unknown')
             print(f"  Doc {i}: {sim:.2f} similarity - {source}")
         
-        context = "\n\n".join([d.page_content for d in top_docs])
+        sources = self._format_sources(top_docs)
+        
+        # Serve near-identical questions that retrieved the same chunks from the answer cache
+        cache_key = None
+        if Config.ANSWER_CACHE_ENABLED:
+            cache_key = answer_cache.make_key(
+                self.store.department,
+                self.store.get_access_levels(),
+                [d.metadata.get('chunk_id') for d in top_docs],
+                history_text=packed['recent_context']  # the prompt depends on it too
+            )
+            cached_answer = answer_cache.get(cache_key, q_emb)
+            if cached_answer is not None:
+                self._remember(question, cached_answer)
+                return {'answer': cached_answer, 'sources': sources}
+        
+        context = packed['context']
         
-        # Include recent conversation for better answers
-        recent_context = ""
-        if self.conversation_history:
-            recent_context = "Previous conversation:\n" + "\n".join([
-                f"Q: {q}\nA: {a}" 
-                for q, a in self.conversation_history[-1:]
-            ]) + "\n\n"
+        # Include recent conversation for better answers (trimmed, without source HTML)
+        recent_context = packed['recent_context']
         
         prompt = f"""
 You are a professional assistant helping with candidate and document inquiries.
@@ -152,9 +202,76 @@ FORMATTING for multiple items:
 Answer:
 """
         
-        answer = self.llm.invoke(prompt).content
+        print(f"🧮 Prompt tokens: {count_tokens(prompt)} (context {packed['context_tokens']} "
+              f"from {len(top_docs)} chunks, history {packed['history_tokens']}, "
+              f"{packed['deduped_chars']} overlapping chars removed)")
+        
+        return {
+            'prompt': prompt,
+            'sources': sources,
+            'cache_key': cache_key,
+            'q_emb': q_emb
+        }
+    
+    def _retrieve(self, query):
+        """
+        Embed and hybrid-search one query
+        
+        Returns:
+            tuple: (query embedding, docs at or above MIN_SIMILARITY)
+        """
+        # ✅ BUG #8 FIX: Use HYBRID search (vector + keyword)
+        q_emb = self._embed_query(query)
+        
+        # Pass both vector AND text for hybrid search
+        docs = self.store.search(
+            query_vector=q_emb, 
+            k=5,  # Get more docs to filter
+            query_text=query,
+            hybrid_alpha=0.7
+        )
         
-        # ✅ ADD SOURCE ATTRIBUTION
+        # ✅ BUG #9 FIX: Filter documents by similarity threshold
+        # Only use docs with similarity >= 60% to prevent hallucinations
+        filtered_docs = [
+            d for d in docs 
+            if d.metadata.get('similarity', 0) >= self.MIN_SIMILARITY
+        ]
+        
+        print(f"📊 Retrieved {len(docs)} docs, {len(filtered_docs)} above {self.MIN_SIMILARITY} threshold")
+        return q_emb, filtered_docs
+    
+    def _retrieve_pipelined(self, question):
+        """
+        Overlap the LLM rewrite with retrieval for the raw question
+        
+        The raw-question results double as the prefetched fallback, so the worst
+        case is rewrite || (embed + search raw), then embed + search rewritten:
+        two sequential network phases instead of four.
+        """
+        rewrite_future = _pipeline_pool.submit(self._rewrite_with_llm, question)
+        
+        # DB access stays on the request thread (db.session is thread-scoped)
+        raw_emb, raw_docs = self._retrieve(question)
+        
+        try:
+            enhanced_question = rewrite_future.result()
+        except Exception as e:
+            print(f"⚠️ Query rewrite failed, using original question: {e}")
+            return raw_emb, raw_docs
+        
+        if enhanced_question.strip().lower() == question.strip().lower():
+            return raw_emb, raw_docs
+        
+        q_emb, filtered_docs = self._retrieve(enhanced_question)
+        if filtered_docs:
+            return q_emb, filtered_docs
+        
+        print("⚠️ No docs above threshold for rewritten question, using original question results")
+        return raw_emb, raw_docs
+    
+    def _format_sources(self, top_docs):
+        """✅ SOURCE ATTRIBUTION: unique source labels for the docs used (max 3)"""
         sources = []
         seen_sources = set()  # Avoid duplicate sources
         
@@ -177,19 +294,24 @@ Answer:
                 sources.append(source_text)
                 seen_sources.add(source_text)
         
-        # Append sources to answer (max 3 unique sources)
+        return sources[:3]
+    
+    def _finalize_answer(self, question, answer, prepared):
+        """Append source lines, populate the answer cache and record history"""
+        sources = prepared['sources']
         if sources:
-            answer += "\n\n" + "\n".join([f"<small>Source: {s}</small>" for s in sources[:3]])
+            answer += "\n\n" + "\n".join([f"<small>Source: {s}</small>" for s in sources])
         
-        # Store in conversation history
-        self.conversation_history.append((question, answer))
-        
-        # Keep only last 5 exchanges
-        if len(self.conversation_history) > 5:
-            self.conversation_history = self.conversation_history[-5:]
+        if prepared['cache_key'] is not None:
+            answer_cache.set(prepared['cache_key'], prepared['q_emb'], answer)
         
+        self._remember(question, answer)
         return answer
     
+    def _remember(self, question, answer):
+        """Store an exchange in conversation history (the store keeps the last N)"""
+        conversation_store.append(self.session_key, question, answer)
+    
     def _generate_no_confident_answer_response(self, question):
         """
         ✅ BUG #9 FIX: Response when no documents meet similarity threshold
@@ -216,4 +338,4 @@ Thank you for your patience!"""
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
\ No newline at end of file
+        conversation_store.clear(self.session_key)
\ No newline at end of file
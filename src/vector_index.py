@@ -0,0 +1,179 @@
+"""
+ANN index management for document_embeddings.embedding
+
+The index is always named ANN_INDEX_NAME and can be HNSW or IVFFlat. Rebuilds
+build a replacement index CONCURRENTLY and swap it in, so chat retrieval keeps
+working while a large index is rebuilt after bulk uploads. On the partitioned
+table every leaf partition gets its own index, attached to the parent index.
+IVFFlat in particular should be rebuilt after big uploads because its
+centroids are computed from the rows present at build time.
+"""
+
+import time
+from extensions import db
+from sqlalchemy import text
+from config import Config
+
+ANN_INDEX_NAME = "idx_document_embeddings_embedding_ann"
+INDEX_TYPES = ("hnsw", "ivfflat")
+
+
+def _autocommit_connection():
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    return db.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def _index_method(index_type, row_count):
+    """USING/WITH clause for the requested index type"""
+    if index_type == "hnsw":
+        return (f"USING hnsw (embedding vector_cosine_ops) "
+                f"WITH (m = {Config.VECTOR_HNSW_M}, ef_construction = {Config.VECTOR_HNSW_EF_CONSTRUCTION})")
+
+    # pgvector guidance: lists = rows / 1000 up to 1M rows, sqrt(rows) above that.
+    # row_count is the rows of the table the index is built on (one partition when
+    # partitioned); never more lists than rows, or most lists are empty and recall drops.
+    if row_count > 1_000_000:
+        lists = int(row_count ** 0.5)
+    else:
+        lists = max(row_count // 1000, min(10, row_count), 1)
+    return f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})"
+
+
+def _partition_tree(conn):
+    """(relid, parent relid, is_leaf, level, name) for every table in the document_embeddings tree"""
+    return conn.execute(text("""
+        SELECT t.relid::oid AS relid, t.parentrelid::oid AS parentrelid, t.isleaf, t.level,
+               t.relid::regclass::text AS name
+        FROM pg_partition_tree('document_embeddings') t
+        ORDER BY t.level
+    """)).fetchall()
+
+
+def get_ann_index_info():
+    """
+    Describe the current ANN index
+
+    Returns:
+        dict: name, type, definition, size and row count (None fields if missing)
+    """
+    row = db.session.execute(text("""
+        SELECT
+            i.indexdef,
+            pg_size_pretty((SELECT COALESCE(SUM(pg_relation_size(t.relid)), 0)
+                            FROM pg_partition_tree(c.oid) t)) AS size,
+            ix.indisvalid AS is_valid
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        JOIN pg_index ix ON ix.indexrelid = c.oid
+        WHERE i.tablename = 'document_embeddings' AND i.indexname = :name
+    """), {"name": ANN_INDEX_NAME}).fetchone()
+
+    # Summed over leaf partitions (a partitioned parent has no rows of its own)
+    row_count = db.session.execute(text("""
+        SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+        FROM pg_partition_tree('document_embeddings') t
+        JOIN pg_class c ON c.oid = t.relid
+        WHERE t.isleaf
+    """)).scalar()
+
+    if not row:
+        return {"name": ANN_INDEX_NAME, "type": None, "definition": None,
+                "size": None, "is_valid": None, "estimated_rows": row_count}
+
+    index_type = next((t for t in INDEX_TYPES if f"USING {t}" in row.indexdef), "unknown")
+    return {
+        "name": ANN_INDEX_NAME,
+        "type": index_type,
+        "definition": row.indexdef,
+        "size": row.size,
+        "is_valid": row.is_valid,
+        "estimated_rows": row_count
+    }
+
+
+def rebuild_ann_index(index_type=None):
+    """
+    Build a fresh ANN index concurrently and swap it in for the current one
+
+    Args:
+        index_type: 'hnsw' or 'ivfflat' (defaults to Config.VECTOR_INDEX_TYPE)
+
+    Returns:
+        dict: index type, build seconds and the resulting index info
+    """
+    index_type = (index_type or Config.VECTOR_INDEX_TYPE).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type '{index_type}' (expected one of {INDEX_TYPES})")
+
+    new_name = f"{ANN_INDEX_NAME}_new"
+    token = int(time.time())
+    start = time.perf_counter()
+
+    with _autocommit_connection() as conn:
+        row_count = conn.execute(text("SELECT COUNT(*) FROM document_embeddings")).scalar()
+        method = _index_method(index_type, row_count)
+        tree = _partition_tree(conn)
+        print(f"🔧 Building {index_type.upper()} index over {row_count} vectors "
+              f"({sum(1 for t in tree if t.isleaf)} partitions)...")
+
+        conn.execute(text(f"SET maintenance_work_mem = '{Config.VECTOR_INDEX_MAINTENANCE_WORK_MEM}'"))
+        # Leftover from an interrupted rebuild
+        conn.execute(text(f"DROP INDEX IF EXISTS {new_name}"))
+
+        if len(tree) == 1:
+            # Plain table: build concurrently and swap
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY {new_name} ON document_embeddings {method}"))
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX_NAME}"))
+        else:
+            # Partitioned table: CONCURRENTLY is not allowed on the parent, so create the
+            # parent (and intermediate) indexes ON ONLY, build each leaf index concurrently
+            # and attach it. The parent index becomes valid once every partition is attached.
+            index_for = {}
+            for node in tree:
+                if node.level == 0:
+                    index_for[node.relid] = new_name
+                    conn.execute(text(f"CREATE INDEX {new_name} ON ONLY {node.name} {method}"))
+                    continue
+
+                child_index = f"idx_ann_{node.relid}_{token}"
+                index_for[node.relid] = child_index
+                if node.isleaf:
+                    # Each leaf gets its own IVFFlat centroids, so size lists from its own rows
+                    leaf_method = method
+                    if index_type == "ivfflat":
+                        leaf_rows = conn.execute(text(f"SELECT COUNT(*) FROM {node.name}")).scalar()
+                        leaf_method = _index_method(index_type, leaf_rows)
+                    conn.execute(text(f"CREATE INDEX CONCURRENTLY {child_index} ON {node.name} {leaf_method}"))
+                else:
+                    conn.execute(text(f"CREATE INDEX {child_index} ON ONLY {node.name} {method}"))
+                conn.execute(text(f"ALTER INDEX {index_for[node.parentrelid]} ATTACH PARTITION {child_index}"))
+
+            # Dropping the old parent index drops its per-partition indexes with it
+            conn.execute(text(f"DROP INDEX IF EXISTS {ANN_INDEX_NAME}"))
+
+        conn.execute(text(f"ALTER INDEX {new_name} RENAME TO {ANN_INDEX_NAME}"))
+        conn.execute(text("ANALYZE document_embeddings"))
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {index_type.upper()} index rebuilt in {elapsed:.1f}s")
+
+    return {
+        "index_type": index_type,
+        "seconds": round(elapsed, 2),
+        "index": get_ann_index_info()
+    }
+
+
+def apply_search_settings(ef_search=None, probes=None, conn=None):
+    """
+    Override ANN search settings for the current transaction only
+
+    Connection-level defaults come from Config.SQLALCHEMY_ENGINE_OPTIONS; this is
+    for callers that want a different recall/latency trade-off for one query.
+    Applies to conn if given, otherwise to the request's db.session.
+    """
+    executor = conn if conn is not None else db.session
+    if ef_search is not None:
+        executor.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes is not None:
+        executor.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
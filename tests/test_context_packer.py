@@ -0,0 +1,83 @@
+import pytest
+from langchain.schema import Document
+
+from src import context_packer
+from src.context_packer import _remove_overlap, pack_context
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # ~4 characters per token, independent of the tiktoken BPE files
+    monkeypatch.setattr(context_packer, "_encoding", False)
+
+
+def doc(text, file_name="policy.pdf"):
+    return Document(page_content=text, metadata={"file_name": file_name})
+
+
+SHARED = "Leave requests go to HR. "
+
+
+def test_remove_overlap_strips_splitter_overlap_at_either_end():
+    previous = "Employees get 26 weeks of maternity leave. " + SHARED
+    assert _remove_overlap(SHARED + "Approval takes two days.", [previous]) == "Approval takes two days."
+
+    following = SHARED + "Approval takes two days."
+    assert _remove_overlap("Sick leave is 12 days a year. " + SHARED, [following]) == "Sick leave is 12 days a year."
+
+
+def test_remove_overlap_drops_contained_chunk():
+    assert _remove_overlap("26 weeks", ["Employees get 26 weeks of maternity leave."]) == ""
+
+
+def test_remove_overlap_ignores_short_matches():
+    assert _remove_overlap("Leave. Approval takes two days.", ["Sick leave. Leave."]) == "Leave. Approval takes two days."
+
+
+def test_pack_context_keeps_boilerplate_shared_across_files():
+    header = "STAR CEMENT LTD - INTERNAL USE ONLY. "
+    packed = pack_context(
+        [doc(header + "Travel policy body.", "travel.pdf"), doc(header + "Leave policy body.", "leave.pdf")],
+        [], max_chunks=3, context_budget=1500
+    )
+    assert packed["context"] == header.strip() + " Travel policy body.\n\n" + header.strip() + " Leave policy body."
+    assert packed["deduped_chars"] == 0
+
+
+def test_pack_context_dedupes_within_a_file():
+    first = "Employees get 26 weeks of maternity leave. " + SHARED
+    packed = pack_context([doc(first), doc(SHARED + "Approval takes two days.")], [],
+                          max_chunks=3, context_budget=1500)
+    assert packed["context"] == first.strip() + "\n\nApproval takes two days."
+    assert packed["deduped_chars"] == len(SHARED)
+
+
+def test_duplicates_do_not_use_up_chunk_slots():
+    docs = [doc("Chunk one about leave."), doc("Chunk one about leave."), doc("Chunk one about leave.", "copy.pdf"),
+            doc("Chunk two about travel."), doc("Chunk three about pay."), doc("Chunk four about bonus.")]
+    packed = pack_context(docs, [], max_chunks=3, context_budget=1500)
+    assert packed["context"].split("\n\n") == ["Chunk one about leave.", "Chunk two about travel.",
+                                               "Chunk three about pay."]
+    assert packed["used_docs"] == [docs[0], docs[3], docs[4]]
+
+
+def test_token_budget_truncates_then_stops():
+    docs = [doc("a" * 400, "a.pdf"), doc("b" * 400, "b.pdf"), doc("c" * 400, "c.pdf")]
+    packed = pack_context(docs, [], max_chunks=3, context_budget=160)
+    # 100 + 60 tokens (second chunk cut to the remaining budget); nothing left for the third
+    assert packed["context_tokens"] == 160
+    assert packed["context"] == "a" * 400 + "\n\n" + "b" * 240
+    assert packed["used_docs"] == docs[:2]
+
+
+def test_top_chunk_is_always_packed():
+    packed = pack_context([doc("x" * 2000)], [], max_chunks=3, context_budget=10)
+    assert packed["context"] == "x" * 4 * context_packer.MIN_PARTIAL_CHUNK_TOKENS
+    assert len(packed["used_docs"]) == 1
+
+
+def test_history_is_stripped_and_budgeted():
+    history = [("Old question?", "Old answer."),
+               ("How many leave days?", "Twelve.<br><small>Source: leave.pdf</small>")]
+    packed = pack_context([doc("Body.")], history, max_chunks=3, context_budget=100, history_budget=100)
+    assert packed["recent_context"] == "Previous conversation:\nQ: How many leave days?\nA: Twelve.\n\n"
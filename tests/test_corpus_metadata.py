@@ -0,0 +1,77 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from src import corpus_metadata, query_cache
+from src.corpus_metadata import CorpusMetadataCache
+from src.partitions import CROSS_DEPT_PARTITION
+
+
+class FakeSession:
+    """Answers the grouped metadata query with the configured rows"""
+
+    def __init__(self):
+        self.rows = []
+        self.queries = 0
+
+    def execute(self, statement, params):
+        self.queries += 1
+        rows = [r for r in self.rows if r.dept_partition in (params["dept"], params["cross"])]
+        return SimpleNamespace(fetchall=lambda: rows)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    fake = FakeSession()
+    monkeypatch.setattr(corpus_metadata, "db", SimpleNamespace(session=fake))
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def row(partition, chunk_count):
+    return SimpleNamespace(dept_partition=partition, chunk_count=chunk_count, last_modified=datetime(2026, 1, 1))
+
+
+def test_positive_result_is_cached_for_full_ttl(session, clock):
+    session.rows = [row("hr", 12)]
+    cache = CorpusMetadataCache(ttl=300, negative_ttl=10)
+    assert cache.has_documents("hr") is True
+    clock[0] += 200
+    assert cache.has_documents("hr") is True
+    assert session.queries == 1
+
+
+def test_negative_result_expires_after_negative_ttl(session, clock):
+    cache = CorpusMetadataCache(ttl=300, negative_ttl=10)
+    assert cache.has_documents("hr") is False
+    assert cache.has_documents("hr") is False
+    assert session.queries == 1
+
+    # Another process uploads the department's first documents
+    session.rows = [row("hr", 5)]
+    clock[0] += 11
+    assert cache.has_documents("hr") is True
+    assert session.queries == 2
+
+
+def test_cross_dept_chunks_count_for_every_department(session, clock):
+    session.rows = [row(CROSS_DEPT_PARTITION, 3)]
+    cache = CorpusMetadataCache()
+    assert cache.has_documents("qa") is True
+    assert cache.get("qa")["exists"] is False
+
+
+def test_record_added_updates_cached_entry(session, clock):
+    session.rows = [row("hr", 12)]
+    cache = CorpusMetadataCache()
+    cache.get("hr")
+    cache.record_added("hr", 4)
+    assert cache.get("hr")["chunk_count"] == 16
+    assert session.queries == 1
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from src.embedding_executor import ConcurrentEmbeddingExecutor, RateLimitBudget
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after="0"):
+        super().__init__("429 Too Many Requests")
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after}})()
+
+
+def fake_embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+def test_vectors_come_back_in_input_order():
+    texts = [f"text {'x' * i}" for i in range(50)]
+    executor = ConcurrentEmbeddingExecutor(fake_embed, batch_size=4, max_workers=4)
+    assert executor.embed(texts) == fake_embed(texts)
+    assert executor.stats["batches"] == 13
+
+
+def test_empty_input_makes_no_calls():
+    executor = ConcurrentEmbeddingExecutor(lambda texts: pytest.fail("embed_fn called"))
+    assert executor.embed([]) == []
+
+
+def test_rate_limited_batch_is_retried():
+    calls = []
+    lock = threading.Lock()
+
+    def flaky(texts):
+        with lock:
+            calls.append(texts)
+            if len(calls) == 1:
+                raise RateLimited(retry_after="0")
+        return fake_embed(texts)
+
+    executor = ConcurrentEmbeddingExecutor(flaky, batch_size=2, max_workers=1)
+    assert executor.embed(["a", "bb", "ccc"]) == fake_embed(["a", "bb", "ccc"])
+    assert executor.stats["rate_limited"] == 1
+    assert len(calls) == 3
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def broken(texts):
+        calls.append(texts)
+        raise ValueError("bad input")
+
+    executor = ConcurrentEmbeddingExecutor(broken, batch_size=2, max_workers=1)
+    with pytest.raises(ValueError):
+        executor.embed(["a", "b"])
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    def always_limited(texts):
+        raise RateLimited(retry_after="0")
+
+    executor = ConcurrentEmbeddingExecutor(always_limited, max_retries=2, max_workers=1)
+    with pytest.raises(RateLimited):
+        executor.embed(["a"])
+    assert executor.stats["rate_limited"] == 2
+
+
+def test_oversized_batch_passes_on_empty_window():
+    budget = RateLimitBudget(tokens_per_minute=10, requests_per_minute=5)
+    budget.acquire(500)  # would otherwise wait forever
+    assert budget._tokens_in_window == 500
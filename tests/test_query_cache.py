@@ -0,0 +1,89 @@
+import pytest
+
+from src import query_cache
+from src.query_cache import SemanticAnswerCache, TTLLRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(query_cache.time, "monotonic", fake)
+    return fake
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TTLLRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    clock.now += 10
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    clock.now += 60
+    assert cache.get("a") is None
+
+
+def test_sliding_ttl_is_refreshed_on_hit(clock):
+    cache = TTLLRUCache(maxsize=10, ttl=60, sliding=True)
+    cache.set("a", 1)
+    clock.now += 50
+    assert cache.get("a") == 1
+    clock.now += 50
+    assert cache.get("a") == 1
+    clock.now += 61
+    assert cache.get("a") is None
+
+
+def test_size_counts_only_live_entries(clock):
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    clock.now += 10
+    assert len(cache) == 1
+    assert cache.stats()["size"] == 1
+
+
+def test_answer_cache_key_covers_history():
+    base = SemanticAnswerCache.make_key("hr", ["public"], [3, 1])
+    assert SemanticAnswerCache.make_key("hr", ["public"], [1, 3]) == base
+    with_history = SemanticAnswerCache.make_key("hr", ["public"], [1, 3], "Q: Who is Neha?\nA: A chemist.")
+    other_history = SemanticAnswerCache.make_key("hr", ["public"], [1, 3], "Q: Who is Amit?\nA: An engineer.")
+    assert len({base, with_history, other_history}) == 3
+
+
+def test_answer_cache_serves_only_near_identical_questions():
+    cache = SemanticAnswerCache(max_distance=0.05)
+    key = SemanticAnswerCache.make_key("hr", ["public"], [1])
+    cache.set(key, [1.0, 0.0], "26 weeks")
+    assert cache.get(key, [0.999, 0.01]) == "26 weeks"
+    assert cache.get(key, [0.0, 1.0]) is None
+    assert cache.get(SemanticAnswerCache.make_key("hr", ["public"], [1], "Q: x\nA: y"), [1.0, 0.0]) is None
+
+
+def test_answer_cache_invalidates_by_department():
+    cache = SemanticAnswerCache()
+    hr_key = SemanticAnswerCache.make_key("hr", ["public"], [1])
+    qa_key = SemanticAnswerCache.make_key("qa", ["public"], [2])
+    cache.set(hr_key, [1.0, 0.0], "hr answer")
+    cache.set(qa_key, [1.0, 0.0], "qa answer")
+    assert cache.invalidate_department("hr") == 1
+    assert cache.get(hr_key, [1.0, 0.0]) is None
+    assert cache.get(qa_key, [1.0, 0.0]) == "qa answer"
@@ -0,0 +1,44 @@
+from src.query_rewriter import extract_entities, rewrite
+
+
+def test_sentence_initial_verb_is_not_an_entity():
+    assert extract_entities("Explain maternity leave") == []
+    assert extract_entities("Summarize the appraisal policy") == []
+
+
+def test_sentence_initial_word_capitalized_elsewhere_is_kept():
+    assert extract_entities("Neha joined in 2019. The team says Neha leads QA.", persons_only=True) == ["Neha"]
+
+
+def test_pronoun_not_replaced_by_sentence_initial_verb():
+    question, confident = rewrite("Is she eligible?", ("Explain maternity leave", "Employees get 26 weeks."))
+    assert (question, confident) == ("Is she eligible?", False)
+
+    question, confident = rewrite("What is her salary?", ("Summarize the appraisal policy", "It covers reviews."))
+    assert (question, confident) == ("What is her salary?", False)
+
+
+def test_pronoun_not_replaced_by_place():
+    question, confident = rewrite(
+        "When did he join?",
+        ("Who is the plant head at Guwahati?", "The plant head at Guwahati is not listed.")
+    )
+    assert (question, confident) == ("When did he join?", False)
+
+
+def test_several_pronouns_fall_back_to_llm():
+    question, confident = rewrite("What about her and him?", ("Tell me about Neha", "Neha is a chemist."))
+    assert (question, confident) == ("What about her and him?", False)
+
+
+def test_ambiguous_antecedent_falls_back_to_llm():
+    question, confident = rewrite("What is his notice period?", ("Compare Rahul and Amit", "Both are engineers."))
+    assert (question, confident) == ("What is his notice period?", False)
+
+
+def test_single_person_is_substituted():
+    question, confident = rewrite("What is her salary?", ("Tell me about Neha Sharma", "Neha Sharma works in QA."))
+    assert (question, confident) == ("What is Neha Sharma's salary?", True)
+
+    question, confident = rewrite("What is his notice period?", ("Rahul Verma joined when?", "In 2019."))
+    assert (question, confident) == ("What is Rahul Verma's notice period?", True)